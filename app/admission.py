@@ -0,0 +1,191 @@
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from fastapi import Depends, HTTPException
+
+from app.auth import get_current_user
+from app.cache import TTLCache
+from app.models import UserModel
+
+
+# Which RateLimitBackend keeps the per-user token buckets; see `backends` below.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_USERS = int(os.getenv("RATE_LIMIT_MAX_USERS", 100000))
+# How long a request may wait for a concurrency slot before it is shed.
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 5))
+
+
+def _class_settings(name: str, rate: float, burst: int, concurrency: int, queue: int):
+    prefix = name.upper()
+    return {
+        # Sustained requests per second per user, and how many may come at once.
+        # A rate of 0 disables the per-user limit for the class.
+        "rate": float(os.getenv(f"RATE_LIMIT_{prefix}_PER_SECOND", rate)),
+        "burst": int(os.getenv(f"RATE_LIMIT_{prefix}_BURST", burst)),
+        # Requests of the class handled at once by this process, and how many
+        # more may wait for a slot before new ones are shed with a 503.
+        "concurrency": int(os.getenv(f"ADMISSION_{prefix}_CONCURRENCY", concurrency)),
+        "queue": int(os.getenv(f"ADMISSION_{prefix}_QUEUE", queue)),
+    }
+
+
+# upload: requests that stream files into GridFS; write: other item and file
+# changes; read: public and per-user reads, which are never rate limited per user.
+ENDPOINT_CLASSES = {
+    "upload": _class_settings("upload", rate=1, burst=10, concurrency=8, queue=16),
+    "write": _class_settings("write", rate=10, burst=50, concurrency=32, queue=64),
+    "read": _class_settings("read", rate=0, burst=0, concurrency=256, queue=512),
+}
+
+
+class RateLimitBackend(ABC):
+    """Storage for per-user token buckets.
+
+    Async so that a shared store (Redis) can enforce limits across worker
+    processes as another subclass.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Take one token; return 0 if granted, else seconds until one is available."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryRateLimiter(RateLimitBackend):
+    """Per-process token buckets; needs no external service.
+
+    A bucket left alone long enough to refill completely is the same as a new
+    one, so idle buckets are dropped by the cache TTL.
+    """
+
+    def __init__(self):
+        self._buckets = TTLCache(maxsize=RATE_LIMIT_MAX_USERS, ttl=60)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated) * rate)
+        if tokens < 1:
+            self._buckets.set(key, (tokens, now), ttl=burst / rate)
+            return (1 - tokens) / rate
+        self._buckets.set(key, (tokens - 1, now), ttl=burst / rate)
+        return 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"buckets": len(self._buckets)}
+
+
+backends = {"memory": MemoryRateLimiter}
+rate_limiter: RateLimitBackend = backends[RATE_LIMIT_BACKEND]()
+
+
+class ConcurrencyLimit:
+    """At most `limit` holders at once, with a bounded number of waiters."""
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+
+    async def acquire(self) -> bool:
+        """Take a slot; False if the queue is full or the wait times out."""
+        if self._slots.locked():
+            if self.queued >= self.max_queue:
+                return False
+            self.queued += 1
+            try:
+                await asyncio.wait_for(
+                    self._slots.acquire(), ADMISSION_QUEUE_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.queued -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+
+limits = {
+    name: ConcurrencyLimit(settings["concurrency"], settings["queue"])
+    for name, settings in ENDPOINT_CLASSES.items()
+}
+
+
+def _rejection(status_code: int, retry_after: float, detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status_code,
+        detail=detail,
+        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+    )
+
+
+@asynccontextmanager
+async def admission(endpoint_class: str, user: Optional[UserModel]):
+    """Hold a slot of `endpoint_class`, after charging `user`'s token bucket.
+
+    Raises 429 when the user is over their rate, 503 when the class's queue is
+    full; both carry Retry-After.
+    """
+    settings = ENDPOINT_CLASSES[endpoint_class]
+    limit = limits[endpoint_class]
+    if user is not None and settings["rate"] > 0:
+        wait = await rate_limiter.take(
+            f"{endpoint_class}:{user.id}", settings["rate"], settings["burst"]
+        )
+        if wait:
+            limit.rate_limited += 1
+            raise _rejection(429, wait, "Too many requests. Slow down and retry.")
+    if not await limit.acquire():
+        limit.shed += 1
+        raise _rejection(503, 1, "The server is busy. Please retry shortly.")
+    try:
+        yield
+    finally:
+        limit.release()
+
+
+async def admit_upload(current_user: UserModel = Depends(get_current_user)):
+    """Dependency for endpoints that store files in GridFS."""
+    async with admission("upload", current_user):
+        yield
+
+
+async def admit_write(current_user: UserModel = Depends(get_current_user)):
+    """Dependency for endpoints that change items or files."""
+    async with admission("write", current_user):
+        yield
+
+
+async def admit_read():
+    """Dependency for read endpoints; concurrency capped, no per-user limit."""
+    async with admission("read", None):
+        yield
+
+
+def admission_stats() -> Dict[str, Any]:
+    """Slot usage, queue depth and rejection counters per endpoint class."""
+    stats: Dict[str, Any] = {}
+    for name, limit in limits.items():
+        for key in ("in_flight", "queued", "admitted", "rate_limited", "shed"):
+            stats[f"{name}_{key}"] = getattr(limit, key)
+    for key, value in rate_limiter.stats().items():
+        stats[f"rate_limit_{key}"] = value
+    return stats
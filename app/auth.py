@@ -1,20 +1,48 @@
+import asyncio
 import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
+from app.cache import TTLCache
 from app.models import UserModel
+from beanie import PydanticObjectId
+from bson import ObjectId
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from pydantic import EmailStr
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor. Stored hashes with a different cost are rehashed on login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Where bcrypt runs: "thread" or "process" pool, and how many hashes run at once.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+# Hash jobs allowed to wait for a worker before new ones are shed with a 503.
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_desired_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_desired_rounds=BCRYPT_ROUNDS,
+)
 SECRET_KEY = os.getenv("SECRET_KEY", "verylongsecurepasswordkey")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+# Resolved users keyed by their id, so authenticated requests skip the users
+# collection. Per process: a user changed through `update_user` is dropped
+# from this worker's cache only, and a change made directly in MongoDB or in
+# another worker (a password reset, `is_active` set to false, a deleted user)
+# is seen once the entry expires, up to USER_CACHE_TTL_SECONDS later.
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
 
 def get_password_hash(password: str) -> str:
     """Hash a password."""
@@ -26,6 +54,105 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """Verify a password and return a new hash if the stored one is outdated."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# --- Password hashing off the event loop ---
+_hash_executor: Executor | None = None
+_hash_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+hash_metrics = {
+    "queued": 0,
+    "running": 0,
+    "completed": 0,
+    "shed": 0,
+    "total_seconds": 0.0,
+    "max_seconds": 0.0,
+}
+
+
+def _get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+            )
+    return _hash_executor
+
+
+async def _run_hash_job(func, *args):
+    """Run a bcrypt call in the hash executor, at most PASSWORD_HASH_WORKERS at a time."""
+    if hash_metrics["queued"] >= PASSWORD_HASH_MAX_QUEUE:
+        hash_metrics["shed"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts in progress. Please retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+    hash_metrics["queued"] += 1
+    waiting = True
+    try:
+        async with _hash_slots:
+            hash_metrics["queued"] -= 1
+            waiting = False
+            hash_metrics["running"] += 1
+            started = time.perf_counter()
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(_get_hash_executor(), func, *args)
+            finally:
+                elapsed = time.perf_counter() - started
+                hash_metrics["running"] -= 1
+                hash_metrics["completed"] += 1
+                hash_metrics["total_seconds"] += elapsed
+                hash_metrics["max_seconds"] = max(hash_metrics["max_seconds"], elapsed)
+    finally:
+        if waiting:
+            hash_metrics["queued"] -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await _run_hash_job(get_password_hash, password)
+
+
+async def verify_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """Verify a password without blocking the event loop.
+
+    Returns `(valid, new_hash)`; `new_hash` is set when the stored hash was
+    made with another cost factor and should be replaced.
+    """
+    return await _run_hash_job(
+        verify_and_update_password, plain_password, hashed_password
+    )
+
+
+def password_hash_stats() -> dict:
+    "Return queue depth and latency figures for password hashing."
+    completed = hash_metrics["completed"]
+    return {
+        **hash_metrics,
+        "avg_seconds": hash_metrics["total_seconds"] / completed if completed else 0.0,
+    }
+
+
+def shutdown_password_hasher():
+    "Shut down the hash executor. Called when the app stops."
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """Create a Jwt access token for login and authentication."""
     to_encodde = data.copy()
@@ -51,7 +178,11 @@ def decode_access_token(token: str) -> dict:
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = {"email": email}
+        # Tokens issued before the user id was embedded only carry the email.
+        user_id = payload.get("uid")
+        if user_id is not None and not ObjectId.is_valid(user_id):
+            raise credentials_exception
+        token_data = {"email": email, "user_id": user_id}
     except JWTError:
         raise credentials_exception
     return token_data
@@ -66,7 +197,40 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserModel:
     )
     # decode the token using the decode_access_token function
     token_data = decode_access_token(token)
-    user = await UserModel.find_one(UserModel.email == token_data["email"])
-    if not user:
+    user_id = token_data["user_id"]
+    user = user_cache.get(user_id) if user_id else None
+    if user is None:
+        if user_id:
+            user = await UserModel.get(PydanticObjectId(user_id))
+        else:
+            user = await UserModel.find_one(UserModel.email == token_data["email"])
+        if user:
+            user_cache.set(str(user.id), user)
+    if not user or not user.is_active or user.email != token_data["email"]:
         raise credentials_exception
     return user
+
+
+def invalidate_cached_user(user_id: PydanticObjectId | str):
+    """Drop a user from the cache. Call after the user is changed or deactivated."""
+    user_cache.pop(str(user_id))
+
+
+async def update_user(user: UserModel, changes: dict):
+    """Apply `changes` to a user document and drop the user from the cache.
+
+    Every write to a user (password, `is_active`, email) should go through
+    here, so the change applies to this worker's next request immediately.
+    """
+    await user.set(changes)
+    invalidate_cached_user(user.id)
+
+
+def clear_user_cache():
+    """Drop every cached user."""
+    user_cache.clear()
+
+
+def user_cache_stats() -> dict:
+    "Return the user cache size and hit/miss counters."
+    return user_cache.stats()
@@ -0,0 +1,64 @@
+import os
+from typing import Any, List, Type
+
+import orjson
+from fastapi import HTTPException, Request
+from pydantic import BaseModel
+
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", 10000))
+# Larger bodies are refused while they stream in, before anything is parsed.
+BULK_MAX_BODY_BYTES = int(os.getenv("BULK_MAX_BODY_BYTES", 32 * 1024 * 1024))
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413, detail=f"Request exceeds the {BULK_MAX_BODY_BYTES} byte limit."
+    )
+
+
+async def _read_body(request: Request) -> bytes:
+    """The request body, or 413 as soon as it grows past BULK_MAX_BODY_BYTES."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > BULK_MAX_BODY_BYTES:
+        raise _too_large()
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > BULK_MAX_BODY_BYTES:
+            raise _too_large()
+    return bytes(body)
+
+
+async def read_bulk_rows(request: Request) -> List[Any]:
+    """Read a JSON array or an NDJSON body (one JSON value per line) into rows."""
+    body = await _read_body(request)
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    try:
+        if content_type in NDJSON_MEDIA_TYPES:
+            rows = [orjson.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            rows = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of rows.")
+    if not rows:
+        raise HTTPException(status_code=400, detail="No rows provided.")
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request."
+        )
+    return rows
+
+
+def bulk_openapi(model: Type[BaseModel]) -> dict:
+    """OpenAPI `requestBody` for an array of `model` rows, as JSON or NDJSON."""
+    row_schema = model.model_json_schema()
+    content = {
+        "application/json": {"schema": {"type": "array", "items": row_schema}},
+        "application/x-ndjson": {"schema": row_schema},
+    }
+    return {"requestBody": {"required": True, "content": content}}
@@ -1,52 +1,408 @@
+import asyncio
+import csv
+import hashlib
+import io
+import logging
+import os
+from datetime import datetime, timezone
+
+import orjson
+
 from fastapi import UploadFile, HTTPException
-from app.models import ItemModel, UserModel
-from app.schemas import ItemCreate, FileResponse
-from beanie import PydanticObjectId
+from app.models import ItemModel, UserModel, utc_now
+from app.schemas import (
+    BulkResult,
+    BulkRowResult,
+    FileResponse,
+    ItemBulkUpdate,
+    ItemCreate,
+)
+from beanie import PydanticObjectId, UpdateResponse
 
-from app.database import grid_fs
+from app.cache import TTLCache
+from app.file_cache import file_cache
+from app.database import get_database, get_grid_fs, public_read_collection
+from app.images import generate_variants, is_resizable
+from app.response_cache import bump_catalog_version, catalog_version
+from app.stats import apply_stats_delta, apply_stats_deltas, stats_delta
+from app.pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+)
 from bson import ObjectId
-from typing import Dict, Any, List, Optional
+from bson.errors import InvalidId
+from gridfs.errors import FileExists
+from pydantic import ValidationError
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upload limits, enforced while the bytes stream into GridFS.
+MAX_UPLOAD_FILE_BYTES = int(os.getenv("MAX_UPLOAD_FILE_BYTES", 10 * 1024 * 1024))
+MAX_UPLOAD_REQUEST_BYTES = int(os.getenv("MAX_UPLOAD_REQUEST_BYTES", 50 * 1024 * 1024))
+# Files of one request written to GridFS at the same time.
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", 4))
+UPLOAD_CHUNK_BYTES = 255 * 1024  # GridFS default chunk size
+
+# Catalog export: documents per cursor batch and bytes per response write.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+EXPORT_FLUSH_BYTES = int(os.getenv("EXPORT_FLUSH_BYTES", 64 * 1024))
+# Bulk update rows read (for the stats deltas) and written per round trip.
+BULK_UPDATE_CHUNK_SIZE = int(os.getenv("BULK_UPDATE_CHUNK_SIZE", 1000))
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 1000))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", 30))
+
+OWNER_EMAIL_CACHE_SIZE = int(os.getenv("OWNER_EMAIL_CACHE_SIZE", 10000))
+OWNER_EMAIL_CACHE_TTL_SECONDS = float(os.getenv("OWNER_EMAIL_CACHE_TTL_SECONDS", 300))
+
+# owner_id -> email, so list pages only ask the users collection for new owners.
+# Per worker, like every cache here; see app.server for how stale each may be.
+owner_email_cache = TTLCache(
+    maxsize=OWNER_EMAIL_CACHE_SIZE, ttl=OWNER_EMAIL_CACHE_TTL_SECONDS
+)
+# Search result pages, keyed by the shared catalog version (see search_items).
+search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS)
 
 
 # --- File/Image CRUD Operations ---
+async def store_image_variants(
+    data: bytes, file_id: ObjectId, filename: str, owner_id: PydanticObjectId
+) -> Dict[str, ObjectId]:
+    """Render and store the resized variants of an image, returning their IDs."""
+    variants = await generate_variants(data)
+    names = list(variants)
+    stored_ids = await asyncio.gather(
+        *(
+            get_grid_fs().upload_from_stream(
+                f"{name}_{filename}",
+                variants[name][0],
+                metadata={
+                    "content_type": variants[name][1],
+                    "owner_id": str(owner_id),
+                    "variant_of": file_id,
+                    "variant": name,
+                    "width": variants[name][2][0],
+                    "height": variants[name][2][1],
+                },
+            )
+            for name in names
+        )
+    )
+    return dict(zip(names, stored_ids))
+
+
+def owns_file(metadata: Optional[Dict[str, Any]], owner_id: PydanticObjectId) -> bool:
+    """Whether `owner_id` holds a reference on the file.
+
+    Deduplicated blobs list one entry per owner in `owner_ids`; files stored
+    before deduplication only have the uploader's `owner_id`.
+    """
+    if not metadata:
+        return True
+    owner = str(owner_id)
+    if "owner_ids" in metadata:
+        return owner in (metadata.get("owner_ids") or [])
+    return metadata.get("owner_id") == owner
+
+
+def _owned_by(owner_id: PydanticObjectId) -> Dict[str, Any]:
+    """fs.files filter matching the files `owns_file` says `owner_id` owns."""
+    owner = str(owner_id)
+    return {
+        "$or": [
+            {"metadata.owner_ids": owner},
+            {"metadata.owner_ids": {"$exists": False}, "metadata.owner_id": owner},
+            {"metadata.owner_ids": {"$exists": False}, "metadata.owner_id": {"$exists": False}},
+        ]
+    }
+
+
+# The write that makes a file unclaimable also takes its hash out of the unique
+# `metadata.sha256` index, so an upload of the same bytes while the file is
+# being purged stores a fresh copy instead of colliding with it.
+RELEASE_LAST_REFERENCE = {"$set": {"metadata.refcount": 0}, "$unset": {"metadata.sha256": ""}}
+
+
+def _stored_file_response(file_doc: Dict[str, Any]) -> FileResponse:
+    metadata = file_doc.get("metadata") or {}
+    return FileResponse(
+        file_id=PydanticObjectId(file_doc["_id"]),
+        filename=file_doc["filename"],
+        content_type=metadata.get("content_type") or "application/octet-stream",
+        upload_date=str(file_doc["uploadDate"]),
+        length=file_doc["length"],
+        variants=metadata.get("variants") or {},
+        message=f"File '{file_doc['filename']}' already stored; reusing ID {file_doc['_id']}",
+    )
+
+
+async def claim_stored_blob(
+    sha256: str, owner_id: PydanticObjectId
+) -> Optional[FileResponse]:
+    """Take `owner_id`'s reference on the stored file with this content hash.
+
+    References are per owner: `refcount` is the length of `owner_ids`, so an
+    owner uploading the same bytes again takes no second reference. Returns
+    None if no such file is stored.
+    """
+    files = get_database()["fs.files"]
+    owner = str(owner_id)
+    claimable = {"metadata.sha256": sha256, "metadata.refcount": {"$gt": 0}}
+    # Restarts the orphan sweeper's grace period for this blob.
+    touch = {"metadata.claimed_at": utc_now()}
+    file_doc = await files.find_one_and_update(
+        {**claimable, "metadata.owner_ids": {"$ne": owner}},
+        {
+            "$inc": {"metadata.refcount": 1},
+            "$push": {"metadata.owner_ids": owner},
+            "$set": touch,
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    added_reference = file_doc is not None
+    if file_doc is None:
+        file_doc = await files.find_one_and_update(
+            {**claimable, "metadata.owner_ids": owner},
+            {"$set": touch},
+            return_document=ReturnDocument.AFTER,
+        )
+    if not file_doc:
+        return None
+    stored = _stored_file_response(file_doc)
+    stored._added_reference = added_reference
+    return stored
+
+
+async def store_gridfs_file(
+    filename: str,
+    content_type: Optional[str],
+    owner_id: PydanticObjectId,
+    chunks: AsyncIterator[bytes],
+    max_bytes: int = MAX_UPLOAD_FILE_BYTES,
+) -> FileResponse:
+    """Write `chunks` to a new GridFS file as they arrive.
+
+    Content is SHA-256 hashed on the way in. If a file with the same hash is
+    already stored, that file gains a reference and its ID is returned; the
+    new copy is dropped. Images are held in memory until the hash is known
+    (they are needed whole for resizing anyway), so duplicates of them never
+    write chunks or render variants. Other files stream straight to GridFS.
+
+    The size limit is enforced while reading, and the returned metadata is
+    what was written, so nothing is read back. New images also get resized
+    variants (see app/images.py), recorded in the original's
+    `metadata.variants`. On any error the partial file and its variants are
+    removed.
+    """
+    file_id = ObjectId()
+    metadata = {"content_type": content_type, "owner_id": str(owner_id)}
+    buffer_first = is_resizable(content_type)
+    grid_in = None
+    if not buffer_first:
+        grid_in = get_grid_fs().open_upload_stream_with_id(file_id, filename, metadata=metadata)
+    digest = hashlib.sha256()
+    buffered: List[bytes] = []
+    length = 0
+    variant_ids: Dict[str, ObjectId] = {}
+    try:
+        async for chunk in chunks:
+            length += len(chunk)
+            if length > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File '{filename}' exceeds the {max_bytes} byte limit.",
+                )
+            digest.update(chunk)
+            if grid_in:
+                await grid_in.write(chunk)
+            else:
+                buffered.append(chunk)
+
+        sha256 = digest.hexdigest()
+        existing = await claim_stored_blob(sha256, owner_id)
+        if existing:
+            if grid_in:
+                await grid_in.abort()
+            return existing
+
+        metadata.update({"sha256": sha256, "refcount": 1, "owner_ids": [str(owner_id)]})
+        if buffer_first:
+            data = b"".join(buffered)
+            variant_ids = await store_image_variants(data, file_id, filename, owner_id)
+            if variant_ids:
+                metadata["variants"] = variant_ids
+            grid_in = get_grid_fs().open_upload_stream_with_id(
+                file_id, filename, metadata=metadata
+            )
+            await grid_in.write(data)
+        else:
+            await grid_in.set("metadata", metadata)
+        await grid_in.close()
+    except FileExists:
+        # An identical upload finished first and took the unique hash.
+        if grid_in:
+            await grid_in.abort()
+        for variant_id in variant_ids.values():
+            await get_grid_fs().delete(variant_id)
+        existing = await claim_stored_blob(sha256, owner_id)
+        if not existing:
+            raise
+        return existing
+    except BaseException:
+        if grid_in:
+            await grid_in.abort()
+        for variant_id in variant_ids.values():
+            await get_grid_fs().delete(variant_id)
+        raise
+
+    return FileResponse(
+        file_id=PydanticObjectId(file_id),  # Convert ObjectId to PydanticObjectId
+        filename=filename,
+        content_type=content_type or "application/octet-stream",
+        upload_date=str(grid_in.upload_date),  # Or format as desired
+        length=length,
+        variants=variant_ids,
+        message=f"File '{filename}' uploaded successfully with ID {file_id}",
+    )
+
+
+async def _read_upload_file(file: UploadFile) -> AsyncIterator[bytes]:
+    """Yield an UploadFile's content in GridFS-chunk-sized pieces."""
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        yield chunk
+
+
 async def upload_file_to_gridfs(
     file: UploadFile, owner_id: PydanticObjectId
 ) -> FileResponse:
     """Uploads a file to GridFS and returns its ID and metadata."""
     try:
-
-        file_id = await grid_fs.upload_from_stream(
-            file.filename,
-            file.file,
-            metadata={
-                "content_type": file.content_type,
-                "owner_id": str(owner_id),
-            },
-        )
-        # Retrieve the uploaded file's metadata to return more info
-        grid_out = await grid_fs.open_download_stream(file_id)
-
-        return FileResponse(
-            file_id=PydanticObjectId(file_id),  # Convert ObjectId to PydanticObjectId
-            filename=grid_out.filename,
-            content_type=grid_out.metadata.get(
-                "content_type", "application/octet-stream"
-            ),
-            upload_date=str(grid_out.upload_date),  # Or format as desired
-            length=grid_out.length,
-            message=f"File '{grid_out.filename}' uploaded successfully with ID {file_id}",
+        return await store_gridfs_file(
+            file.filename, file.content_type, owner_id, _read_upload_file(file)
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error uploading file to GridFS: {e}")
         raise HTTPException(status_code=500, detail=f"Could not upload file: {e}")
 
 
-async def get_gridfs_file(file_id: PydanticObjectId):
-    """Retrieves a file from GridFS by its ID."""
+async def release_gridfs_file(file_id: ObjectId, owner_id: PydanticObjectId) -> bool:
+    """Drop `owner_id`'s reference to a stored file.
+
+    Only an owner listed on the file has a reference, and dropping it removes
+    them from the list, so releasing twice does nothing the second time. The
+    file and its variants are deleted when the last reference goes (files
+    stored before reference counting have exactly one). Returns whether the
+    file was deleted.
+    """
+    files = get_database()["fs.files"]
+    owned = {"_id": file_id, **_owned_by(owner_id)}
+    drop_owner = {"$pull": {"metadata.owner_ids": str(owner_id)}}
+    # A claim landing between the two writes turns a last reference into a
+    # shared one; try again rather than leave the owner's reference behind.
+    for _ in range(3):
+        still_used = await files.find_one_and_update(
+            {**owned, "metadata.refcount": {"$gt": 1}},
+            {**drop_owner, "$inc": {"metadata.refcount": -1}},
+            projection={"_id": 1},
+        )
+        if still_used:
+            return False
+        file_doc = await files.find_one_and_update(
+            {**owned, "metadata.refcount": {"$not": {"$gt": 1}}},
+            {**drop_owner, **RELEASE_LAST_REFERENCE},
+            projection={"metadata.variants": 1},
+        )
+        if file_doc:
+            await purge_gridfs_files([file_doc])
+            return True
+    return False
+
+
+async def release_gridfs_files(
+    file_ids: List[ObjectId], owner_id: PydanticObjectId
+) -> int:
+    """Drop `owner_id`'s reference to each of several stored files.
+
+    Batched counterpart of `release_gridfs_file`: a fixed number of round trips
+    however many files there are. A reference that became shared through a
+    concurrent claim between the writes is kept; the orphan sweeper collects
+    such files once no item links them. Returns the number of files deleted.
+    """
+    if not file_ids:
+        return 0
+    files = get_database()["fs.files"]
+    owned = {"_id": {"$in": file_ids}, **_owned_by(owner_id)}
+    drop_owner = {"$pull": {"metadata.owner_ids": str(owner_id)}}
+    await files.update_many(
+        {**owned, "metadata.refcount": {"$gt": 1}},
+        {**drop_owner, "$inc": {"metadata.refcount": -1}},
+    )
+    # As in release_gridfs_file, zero the counts before deleting; a blob claimed
+    # in the meantime keeps its count above one and survives.
+    await files.update_many(
+        {**owned, "metadata.refcount": {"$not": {"$gt": 1}}},
+        {**drop_owner, **RELEASE_LAST_REFERENCE},
+    )
+    doomed = await files.find(
+        {"_id": {"$in": file_ids}, "metadata.refcount": 0}, {"metadata.variants": 1}
+    ).to_list(None)
+    await purge_gridfs_files(doomed)
+    return len(doomed)
+
+
+async def purge_gridfs_files(file_docs: List[Dict[str, Any]]) -> int:
+    """Delete fs.files documents, their variants and their chunks.
+
+    `file_docs` need `_id` and `metadata.variants`. Two `delete_many` calls in
+    total, files first so a half-finished purge never leaves a readable file
+    with missing chunks. Returns the number of fs.files documents deleted.
+    """
+    file_ids: List[ObjectId] = []
+    for file_doc in file_docs:
+        file_ids.append(file_doc["_id"])
+        file_ids.extend(((file_doc.get("metadata") or {}).get("variants") or {}).values())
+    if not file_ids:
+        return 0
+    file_cache.invalidate(file_ids)
+    deleted = await get_database()["fs.files"].delete_many({"_id": {"$in": file_ids}})
+    await get_database()["fs.chunks"].delete_many({"files_id": {"$in": file_ids}})
+    return deleted.deleted_count
+
+
+async def delete_stored_files(files: List[FileResponse], owner_id: PydanticObjectId):
+    """Release freshly stored files, e.g. to roll back an upload.
+
+    A file the owner already held a reference on before this upload is kept.
+    """
+    for stored in files:
+        if not stored._added_reference:
+            continue
+        try:
+            await release_gridfs_file(ObjectId(str(stored.file_id)), owner_id)
+        except Exception as e:
+            logger.warning("Could not roll back uploaded file %s: %s", stored.file_id, e)
+
+
+async def get_gridfs_file(file_id: PydanticObjectId, variant: Optional[str] = None):
+    """Retrieves a file from GridFS by its ID.
+
+    With `variant`, returns that resized variant of the file instead, falling
+    back to the original when it has none (non-images, older uploads).
+    """
     try:
         # Convert PydanticObjectId back to ObjectId for GridFS query
         grid_fs_file_id = ObjectId(str(file_id))
-        grid_out = await grid_fs.open_download_stream(grid_fs_file_id)
+        grid_out = await get_grid_fs().open_download_stream(grid_fs_file_id)
+        if variant:
+            variant_id = ((grid_out.metadata or {}).get("variants") or {}).get(variant)
+            if variant_id:
+                grid_out = await get_grid_fs().open_download_stream(variant_id)
         return grid_out
     except Exception as e:
         print(f"Error retrieving file {file_id} from GridFS: {e}")
@@ -56,23 +412,45 @@ async def get_gridfs_file(file_id: PydanticObjectId):
         )
 
 
+async def iter_gridfs_file(grid_out, start: int = 0, end: Optional[int] = None):
+    """Yield bytes `start`..`end` (inclusive) of an open GridFS file.
+
+    Seeking only moves the read position, so the first read fetches the
+    chunk that holds `start` instead of streaming everything before it.
+    """
+    end = grid_out.length - 1 if end is None else end
+    if start:
+        grid_out.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        data = await grid_out.read(min(grid_out.chunk_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
 async def delete_gridfs_file(file_id: PydanticObjectId, owner_id: PydanticObjectId):
     """Deletes a file from GridFS by its ID, ensuring ownership."""
     try:
         grid_fs_file_id = ObjectId(str(file_id))
-        file_info = await grid_fs.find_one({"_id": grid_fs_file_id})
+        file_info = await get_database()["fs.files"].find_one(
+            {"_id": grid_fs_file_id}, {"metadata": 1}
+        )
         if not file_info:
             raise HTTPException(
                 status_code=404, detail=f"File with ID {file_id} not found."
             )
 
-        if file_info.metadata and file_info.metadata.get("owner_id") != str(owner_id):
+        if not owns_file(file_info.get("metadata"), owner_id):
             raise HTTPException(
                 status_code=403, detail="Not authorized to delete this file."
             )
 
-        await grid_fs.delete(grid_fs_file_id)
-        return {"message": f"File with ID {file_id} deleted successfully."}
+        # Deduplicated blobs are only removed once nothing references them.
+        if await release_gridfs_file(grid_fs_file_id, owner_id):
+            return {"message": f"File with ID {file_id} deleted successfully."}
+        return {"message": f"File with ID {file_id} released; it is still in use."}
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -96,31 +474,214 @@ async def create_item(
 
         new_item = ItemModel(**new_item_dict)
         await new_item.insert()
+        await catalog_changed()
+        await apply_stats_delta(owner_id, stats_delta(None, new_item))
         return f"Item {new_item.id} created successfully."
     except Exception as e:
         print(f"Error creating item: {e}")
-        return "Error creating item."
+        raise HTTPException(status_code=500, detail="Error creating item.")
+
+
+def _bulk_result(results: List[BulkRowResult]) -> BulkResult:
+    results.sort(key=lambda row: row.index)
+    succeeded = sum(row.status in ("created", "updated") for row in results)
+    return BulkResult(
+        succeeded=succeeded, failed=len(results) - succeeded, results=results
+    )
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in exc.errors()
+    )
+
+
+def _write_errors(exc: BulkWriteError) -> Dict[int, str]:
+    """Map the op index of each failed write in a bulk operation to its message."""
+    return {err["index"]: err.get("errmsg", "write failed") for err in exc.details["writeErrors"]}
+
+
+async def bulk_create_items(rows: List[Any], owner_id: PydanticObjectId) -> BulkResult:
+    """Validate rows as ItemCreate and insert the valid ones in one unordered insert_many."""
+    results: List[BulkRowResult] = []
+    new_items: List[ItemModel] = []
+    row_indexes: List[int] = []
+    for index, row in enumerate(rows):
+        try:
+            item_data = ItemCreate.model_validate(row)
+        except ValidationError as e:
+            results.append(
+                BulkRowResult(index=index, status="invalid", error=_validation_message(e))
+            )
+            continue
+        new_items.append(
+            ItemModel(
+                id=PydanticObjectId(),
+                owner_id=owner_id,
+                image_ids=[],
+                **item_data.model_dump(),
+            )
+        )
+        row_indexes.append(index)
+
+    failed: Dict[int, str] = {}
+    if new_items:
+        try:
+            await ItemModel.insert_many(new_items, ordered=False)
+        except BulkWriteError as e:
+            failed = _write_errors(e)
+        await catalog_changed()
+        await apply_stats_deltas(
+            [
+                (owner_id, stats_delta(None, item))
+                for position, item in enumerate(new_items)
+                if position not in failed
+            ]
+        )
+
+    for position, (index, item) in enumerate(zip(row_indexes, new_items)):
+        if position in failed:
+            results.append(
+                BulkRowResult(index=index, status="error", error=failed[position])
+            )
+        else:
+            results.append(BulkRowResult(index=index, id=str(item.id), status="created"))
+    return _bulk_result(results)
+
+
+async def bulk_update_items(rows: List[Any], owner_id: PydanticObjectId) -> BulkResult:
+    """Apply partial updates to many items with unordered bulk_writes.
+
+    Rows are written BULK_UPDATE_CHUNK_SIZE at a time. For each chunk one
+    projection query on the requested IDs tells missing items from ones owned
+    by someone else and gives the price and quantity the stats deltas start
+    from; the owner is still part of every update filter. A reservation that
+    changes a quantity between that read and the write makes the rollups
+    drift by its units, which `python -m app.stats rebuild` repairs.
+    """
+    results: List[BulkRowResult] = []
+    updates: List[Tuple[int, ObjectId, Dict[str, Any]]] = []
+    for index, row in enumerate(rows):
+        try:
+            row_data = ItemBulkUpdate.model_validate(row)
+            item_id = ObjectId(row_data.id)
+        except ValidationError as e:
+            results.append(
+                BulkRowResult(index=index, status="invalid", error=_validation_message(e))
+            )
+            continue
+        except InvalidId as e:
+            results.append(BulkRowResult(index=index, status="invalid", error=str(e)))
+            continue
+        changes = row_data.model_dump(exclude_unset=True, exclude={"id"})
+        if not changes:
+            results.append(
+                BulkRowResult(
+                    index=index, id=row_data.id, status="invalid", error="No update data provided."
+                )
+            )
+            continue
+        updates.append((index, item_id, changes))
+
+    for start in range(0, len(updates), BULK_UPDATE_CHUNK_SIZE):
+        results.extend(
+            await _bulk_update_chunk(updates[start : start + BULK_UPDATE_CHUNK_SIZE], owner_id)
+        )
+    if updates:
+        await catalog_changed()
+    return _bulk_result(results)
+
+
+async def _bulk_update_chunk(
+    updates: List[Tuple[int, ObjectId, Dict[str, Any]]], owner_id: PydanticObjectId
+) -> List[BulkRowResult]:
+    results: List[BulkRowResult] = []
+    cursor = ItemModel.get_motor_collection().find(
+        {"_id": {"$in": [item_id for _, item_id, _ in updates]}},
+        {"owner_id": 1, "price": 1, "quantity": 1, "reserved": 1},
+    )
+    existing = {doc["_id"]: doc async for doc in cursor}
+
+    now = utc_now()
+    operations = []
+    op_rows: List[Tuple[int, ObjectId]] = []
+    deltas: List[Dict[str, float]] = []
+    for index, item_id, changes in updates:
+        if item_id not in existing:
+            results.append(BulkRowResult(index=index, id=str(item_id), status="not_found"))
+        elif existing[item_id]["owner_id"] != owner_id:
+            results.append(BulkRowResult(index=index, id=str(item_id), status="forbidden"))
+        else:
+            changes["updated_at"] = now
+            operations.append(
+                UpdateOne({"_id": item_id, "owner_id": owner_id}, item_update(changes))
+            )
+            op_rows.append((index, item_id))
+            after = _updated(existing[item_id], changes)
+            deltas.append(stats_delta(existing[item_id], after))
+            existing[item_id] = after  # a later row for the same item starts here
+
+    failed: Dict[int, str] = {}
+    if operations:
+        try:
+            await ItemModel.get_motor_collection().bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            failed = _write_errors(e)
+        await apply_stats_deltas(
+            [
+                (owner_id, delta)
+                for position, delta in enumerate(deltas)
+                if position not in failed
+            ]
+        )
+
+    for position, (index, item_id) in enumerate(op_rows):
+        if position in failed:
+            results.append(
+                BulkRowResult(index=index, id=str(item_id), status="error", error=failed[position])
+            )
+        else:
+            results.append(BulkRowResult(index=index, id=str(item_id), status="updated"))
+    return results
 
 
 async def get_item(item_id: str):
-    """Retrieve an item by ID."""
+    """Retrieve an item by ID, joined with its owner's email in one round trip."""
     try:
-        item = await ItemModel.get(PydanticObjectId(item_id))
-        if not item:
+        pipeline = [
+            {"$match": {"_id": ObjectId(item_id)}},
+            {
+                "$lookup": {
+                    "from": UserModel.get_collection_name(),
+                    "localField": "owner_id",
+                    "foreignField": "_id",
+                    "pipeline": [{"$project": {"email": 1}}],
+                    "as": "owner",
+                }
+            },
+        ]
+        docs = (
+            await ItemModel.get_motor_collection()
+            .aggregate(pipeline)
+            .to_list(length=1)
+        )
+        if not docs:
             raise HTTPException(status_code=404, detail="Item not found.")
+        item = docs[0]
 
-        owner = await UserModel.get(item.owner_id)
-        owner_email = owner.email if owner else None
+        owner_email = item["owner"][0]["email"] if item["owner"] else None
+        owner_email_cache.set(item["owner_id"], owner_email)
 
         return {
-            "id": str(item.id),
-            "name": item.name,
-            "description": item.description,
-            "price": item.price,
-            "quantity": item.quantity,
+            "id": str(item["_id"]),
+            "name": item["name"],
+            "description": item.get("description"),
+            "price": item["price"],
+            "quantity": item["quantity"],
+            "reserved": item.get("reserved", 0),
             "owner_email": owner_email,
-            "owner_id": str(item.owner_id),
-            "image_ids": item.image_ids,
+            "owner_id": str(item["owner_id"]),
+            "image_ids": item.get("image_ids") or [],
         }
 
     except Exception as e:
@@ -128,9 +689,273 @@ async def get_item(item_id: str):
         return None
 
 
-async def get_all_items():
-    """Retrieve all items in the database."""
-    return await ItemModel.find_all().to_list()
+def _item_projection(fields: Optional[List[str]]) -> Optional[Dict[str, int]]:
+    """MongoDB projection for the requested list fields (None means everything)."""
+    if not fields:
+        return None
+    projection = {field: 1 for field in fields if field != "owner_email"}
+    if "owner_email" in fields:
+        projection["owner_id"] = 1
+    return projection
+
+
+async def _finish_page(
+    docs: List[Dict[str, Any]], fields: Optional[List[str]]
+) -> List[Dict[str, Any]]:
+    """Join owner emails if requested. Documents stay raw; see `dump_json`."""
+    if fields and "owner_email" in fields:
+        await attach_owner_emails(docs)
+        if "owner_id" not in fields:
+            for doc in docs:
+                doc.pop("owner_id", None)
+    return docs
+
+
+async def get_items_page(
+    filters: Dict[str, Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    public: bool = False,
+    sort: Optional[List[Tuple[str, int]]] = None,
+    hint: Optional[str] = None,
+):
+    """Retrieve one page of items matching `filters`, keyset paginated.
+
+    Pages are ordered by `sort` (default `_id`), with `_id` breaking ties.
+    Only `fields` (plus `_id`) are fetched from MongoDB. The returned `next`
+    token resumes right after the last item of this page, so every page is an
+    index range scan no matter how deep the client has paged. `hint` pins the
+    index (see app/filters.py). `public` pages are read with
+    PUBLIC_READ_PREFERENCE and may lag behind recent writes.
+    """
+    sort = sort or [("_id", 1)]
+    sort_key = sort[0][0] if len(sort) > 1 else None
+    collection = ItemModel.get_motor_collection()
+    if public:
+        collection = public_read_collection(collection)
+    query = dict(filters)
+    if cursor:
+        last_id, last_value = decode_cursor(cursor)
+        query.update(keyset_filter(sort, last_id, last_value))
+
+    projection = _item_projection(fields)
+    if projection is not None and sort_key:
+        projection[sort_key] = 1  # needed for the next page token
+    find = collection.find(query, projection).sort(sort).limit(limit + 1)
+    if hint:
+        find = find.hint(hint)
+    # Fetch one extra document to know whether another page exists.
+    docs = await find.to_list(length=limit + 1)
+    next_token = None
+    if len(docs) > limit:
+        last = docs[limit - 1]
+        next_token = encode_cursor(last["_id"], last.get(sort_key) if sort_key else None)
+    docs = docs[:limit]
+    if sort_key and fields and sort_key not in fields:
+        for doc in docs:
+            doc.pop(sort_key, None)
+    return {"items": await _finish_page(docs, fields), "next": next_token}
+
+
+async def search_items(
+    q: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+):
+    """Full-text search over item names and descriptions, best matches first.
+
+    Uses the weighted text index declared on ItemModel. Pages are keyed on
+    (textScore, _id). Results are cached per process until an item changes
+    in any worker (see `catalog_changed`) or SEARCH_CACHE_TTL_SECONDS passes.
+    """
+    # Keyed by the shared catalog version too, so a write in another worker
+    # also retires this worker's cached results.
+    cache_key = (
+        await catalog_version(),
+        " ".join(q.lower().split()),
+        limit,
+        cursor,
+        tuple(fields or ()),
+    )
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {"$text": {"$search": q}}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if cursor:
+        last_id, last_score = decode_cursor(cursor)
+        pipeline.append(
+            {
+                "$match": {
+                    "$or": [
+                        {"score": {"$lt": last_score}},
+                        {"score": last_score, "_id": {"$gt": last_id}},
+                    ]
+                }
+            }
+        )
+    pipeline += [{"$sort": {"score": -1, "_id": 1}}, {"$limit": limit + 1}]
+    projection = _item_projection(fields)
+    if projection:
+        pipeline.append({"$project": {**projection, "score": 1}})
+
+    docs = (
+        await public_read_collection(ItemModel.get_motor_collection())
+        .aggregate(pipeline)
+        .to_list(length=limit + 1)
+    )
+    next_token = None
+    if len(docs) > limit:
+        last = docs[limit - 1]
+        next_token = encode_cursor(last["_id"], last["score"])
+    page = {"items": await _finish_page(docs[:limit], fields), "next": next_token}
+    search_cache.set(cache_key, page)
+    return page
+
+
+async def catalog_changed():
+    """Invalidate caches of catalog reads. Call after any item write."""
+    search_cache.clear()
+    await bump_catalog_version()
+
+
+async def attach_owner_emails(docs: List[Dict[str, Any]]):
+    """Set `owner_email` on raw item documents with at most one users query."""
+    emails: Dict[ObjectId, Optional[str]] = {}
+    missing = set()
+    for doc in docs:
+        owner_id = doc.get("owner_id")
+        if owner_id is None or owner_id in emails:
+            continue
+        email = owner_email_cache.get(owner_id)
+        if email is None:
+            missing.add(owner_id)
+        else:
+            emails[owner_id] = email
+
+    if missing:
+        users = UserModel.get_motor_collection().find(
+            {"_id": {"$in": list(missing)}}, {"email": 1}
+        )
+        async for user in users:
+            emails[user["_id"]] = user["email"]
+            owner_email_cache.set(user["_id"], user["email"])
+
+    for doc in docs:
+        doc["owner_email"] = emails.get(doc.get("owner_id"))
+
+
+EXPORT_FIELDS = (
+    "_id",
+    "name",
+    "description",
+    "price",
+    "quantity",
+    "owner_id",
+    "image_ids",
+    "updated_at",
+)
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return ";".join(str(v) for v in value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    return "" if value is None else value
+
+
+async def iter_items_export(
+    export_format: str, updated_since: Optional[datetime] = None
+) -> AsyncIterator[bytes]:
+    """Stream the catalog as NDJSON or CSV straight from a Motor cursor.
+
+    Documents are formatted as they come off the cursor and written out in
+    roughly EXPORT_FLUSH_BYTES pieces, so memory use does not depend on the
+    catalog size. With `updated_since`, only items written at or after that
+    time are exported, in `updated_at` order.
+    """
+    query: Dict[str, Any] = {}
+    sort = [("_id", 1)]
+    if updated_since:
+        query["updated_at"] = {"$gte": updated_since}
+        sort = [("updated_at", 1), ("_id", 1)]
+    cursor = (
+        ItemModel.get_motor_collection()
+        .find(query, {field: 1 for field in EXPORT_FIELDS})
+        .sort(sort)
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        async for doc in cursor:
+            writer.writerow([_csv_value(doc.get(field)) for field in EXPORT_FIELDS])
+            if buffer.tell() >= EXPORT_FLUSH_BYTES:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+        return
+
+    chunk = bytearray()
+    async for doc in cursor:
+        chunk += orjson.dumps(doc, default=str, option=orjson.OPT_NAIVE_UTC)
+        chunk += b"\n"
+        if len(chunk) >= EXPORT_FLUSH_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+async def _item_owner(item_id: ObjectId) -> Optional[ObjectId]:
+    """Owner of an item, or None if it does not exist.
+
+    Used only after a conditional write matched nothing, to tell 404 from 403
+    without an extra read on the success path.
+    """
+    item = await ItemModel.get_motor_collection().find_one(
+        {"_id": item_id}, {"owner_id": 1}
+    )
+    return item["owner_id"] if item else None
+
+
+def item_update(changes: Dict[str, Any]) -> Any:
+    """The update writing an owner's `changes` to an item.
+
+    An owner's `quantity` counts the units on hand, reserved ones included,
+    while the stored `quantity` is what buyers may still reserve. So a
+    quantity change becomes an update pipeline subtracting the item's
+    `reserved` units in the same write, and held reservations keep their units
+    whatever stock level the owner sets.
+    """
+    if "quantity" not in changes:
+        return {"$set": changes}
+    fields = {
+        key: {"$literal": value} for key, value in changes.items() if key != "quantity"
+    }
+    fields["quantity"] = {
+        "$subtract": [changes["quantity"], {"$ifNull": ["$reserved", 0]}]
+    }
+    return [{"$set": fields}]
+
+
+def _updated(doc: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """`doc` as `item_update(changes)` leaves it."""
+    after = {**doc, **changes}
+    if "quantity" in changes:
+        after["quantity"] = changes["quantity"] - (doc.get("reserved") or 0)
+    return after
 
 
 async def update_item(
@@ -138,15 +963,13 @@ async def update_item(
 ):
     """Update an item by ID. item_data should be a dict.
     Can also update image_ids.
-    """
-    item = await ItemModel.get(PydanticObjectId(item_id))
-    if not item:
-        return {"modified": False, "message": "Item not found."}
-    if item.owner_id != owner_id:
-        raise HTTPException(
-            status_code=403, detail="Not authorized to update this item."
-        )
 
+    A single find_one_and_update with the owner in the filter applies the
+    change and returns the updated item. When price or quantity change it
+    returns the item as it was instead, for the stats rollups, and the item as
+    written is derived from it (see `item_update`), validated like any item
+    read. `quantity` counts the units on hand, reserved ones included.
+    """
     # Ensure image_ids if present is a list of PydanticObjectId
     if "image_ids" in item_data and item_data["image_ids"] is not None:
         try:
@@ -156,53 +979,93 @@ async def update_item(
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid format for image_ids.")
 
-    await item.set(item_data)
-    return {"modified": True, "item": await ItemModel.get(PydanticObjectId(item_id))}
+    item_data["updated_at"] = utc_now()
+    item_oid = PydanticObjectId(item_id)
+    changes_stats = "price" in item_data or "quantity" in item_data
+    doc = await ItemModel.get_motor_collection().find_one_and_update(
+        {"_id": item_oid, "owner_id": owner_id},
+        item_update(item_data),
+        return_document=(
+            ReturnDocument.BEFORE if changes_stats else ReturnDocument.AFTER
+        ),
+    )
+    if not doc:
+        if await _item_owner(item_oid) is None:
+            return {"modified": False, "message": "Item not found."}
+        raise HTTPException(
+            status_code=403, detail="Not authorized to update this item."
+        )
+    await catalog_changed()
+    if changes_stats:
+        before, doc = doc, _updated(doc, item_data)
+        await apply_stats_delta(owner_id, stats_delta(before, doc))
+    return {"modified": True, "item": ItemModel.model_validate(doc)}
 
 
 async def delete_item(item_id: str, owner_id: PydanticObjectId):
-    """Delete an item by ID, ensuring ownership."""
-    item = await ItemModel.get(PydanticObjectId(item_id))
+    """Delete an item by ID, ensuring ownership, and release its files.
+
+    The owner's reference on each file is released in batched writes (see
+    `release_gridfs_files`), except on files another of their items links.
+    """
+    item_oid = PydanticObjectId(item_id)
+    item = await ItemModel.get_motor_collection().find_one_and_delete(
+        {"_id": item_oid, "owner_id": owner_id},
+        projection={"image_ids": 1, "price": 1, "quantity": 1},
+    )
     if not item:
-        return {"deleted": False, "message": "Item not found."}
-    if item.owner_id != owner_id:
+        if await _item_owner(item_oid) is None:
+            return {"deleted": False, "message": "Item not found."}
         raise HTTPException(
             status_code=403, detail="Not authorized to delete this item."
         )
+    await catalog_changed()
+    await apply_stats_delta(owner_id, stats_delta(item, None))
 
-    if item.image_ids:
-        for img_id in item.image_ids:
-            try:
-
-                await delete_gridfs_file(img_id, owner_id)
-                print(f"Associated file {img_id} deleted from GridFS.")
-            except HTTPException as e:
-
-                print(f"Could not delete associated file {img_id}: {e.detail}")
-            except Exception as e:
-                print(
-                    f"An unexpected error occurred while deleting associated file {img_id}: {e}"
+    image_ids = item.get("image_ids") or []
+    if image_ids:
+        try:
+            still_linked = set(
+                await ItemModel.get_motor_collection().distinct(
+                    "image_ids", {"image_ids": {"$in": image_ids}, "owner_id": owner_id}
                 )
+            )
+            released = [i for i in image_ids if i not in still_linked]
+            deleted = await release_gridfs_files(released, owner_id)
+            logger.info(
+                "Released %d file(s) of item %s; %d deleted from GridFS.",
+                len(released),
+                item_id,
+                deleted,
+            )
+        except Exception as e:
+            # Whatever is left unreferenced is collected by the orphan sweeper.
+            logger.warning("Could not release the files of item %s: %s", item_id, e)
 
-    await item.delete()
     return {"deleted": True, "message": f"Item {item_id} and associated files deleted."}
 
 
 async def associate_image_with_item(
     item_id: str, image_id: PydanticObjectId, owner_id: PydanticObjectId
 ):
-    """Associates an uploaded image (GridFS file ID) with an item."""
-    item = await ItemModel.get(PydanticObjectId(item_id))
+    """Associates an uploaded image (GridFS file ID) with an item.
+
+    One atomic $addToSet, so concurrent edits of the same item never lose an image.
+    """
+    item_oid = PydanticObjectId(item_id)
+    item = await ItemModel.find_one(
+        ItemModel.id == item_oid, ItemModel.owner_id == owner_id
+    ).update(
+        {"$addToSet": {"image_ids": image_id}, "$set": {"updated_at": utc_now()}},
+        response_type=UpdateResponse.NEW_DOCUMENT,
+    )
     if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if item.owner_id != owner_id:
+        if await _item_owner(item_oid) is None:
+            raise HTTPException(status_code=404, detail="Item not found")
         raise HTTPException(
             status_code=403, detail="Not authorized to modify this item."
         )
-
-    if image_id not in item.image_ids:
-        item.image_ids.append(image_id)
-        await item.save()
+    await catalog_changed()
     return {
         "message": f"Image {image_id} associated with item {item_id}.",
         "item": item,
@@ -212,24 +1075,33 @@ async def associate_image_with_item(
 async def disassociate_image_from_item(
     item_id: str, image_id: PydanticObjectId, owner_id: PydanticObjectId
 ):
-    """Disassociates an image from an item. Does not delete the file from GridFS."""
-    item = await ItemModel.get(PydanticObjectId(item_id))
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if item.owner_id != owner_id:
-        raise HTTPException(
-            status_code=403, detail="Not authorized to modify this item."
-        )
+    """Disassociates an image from an item. Does not delete the file from GridFS.
 
-    if image_id in item.image_ids:
-        item.image_ids.remove(image_id)
-        await item.save()
-        return {
-            "message": f"Image {image_id} disassociated from item {item_id}.",
-            "item": item,
-        }
-    else:
+    One atomic $pull, conditional on the owner and on the image being linked.
+    """
+    item_oid = PydanticObjectId(item_id)
+    item = await ItemModel.find_one(
+        ItemModel.id == item_oid,
+        ItemModel.owner_id == owner_id,
+        {"image_ids": image_id},
+    ).update(
+        {"$pull": {"image_ids": image_id}, "$set": {"updated_at": utc_now()}},
+        response_type=UpdateResponse.NEW_DOCUMENT,
+    )
+    if not item:
+        item_owner = await _item_owner(item_oid)
+        if item_owner is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        if item_owner != owner_id:
+            raise HTTPException(
+                status_code=403, detail="Not authorized to modify this item."
+            )
         raise HTTPException(
             status_code=404,
             detail=f"Image {image_id} not associated with item {item_id}.",
         )
+    await catalog_changed()
+    return {
+        "message": f"Image {image_id} disassociated from item {item_id}.",
+        "item": item,
+    }
@@ -0,0 +1,276 @@
+"""Local disk tier for GridFS files served by GET /file/{file_id}.
+
+A file read from GridFS is written once to FILE_CACHE_DIR and later requests
+are answered from that copy with a FileResponse, without touching MongoDB
+(the server may use the ASGI pathsend extension, i.e. sendfile, for these).
+Entries are evicted least recently used first once FILE_CACHE_MAX_BYTES is
+exceeded, dropped when the file is purged from GridFS (crud.purge_gridfs_files)
+and, because other workers may have purged it, rechecked against fs.files
+every FILE_CACHE_REVALIDATE_SECONDS.
+
+Each worker process keeps its own index and subdirectory, so the byte budget
+applies per worker.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import anyio
+from bson import ObjectId
+from fastapi.responses import FileResponse
+
+from app.database import get_database
+
+
+logger = logging.getLogger(__name__)
+
+FILE_CACHE_DIR = os.getenv(
+    "FILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "mongomart-file-cache")
+)
+# Total size of the cached files, per worker; 0 disables the cache.
+FILE_CACHE_MAX_BYTES = int(os.getenv("FILE_CACHE_MAX_BYTES", 1024**3))
+# Larger files are always streamed from GridFS.
+FILE_CACHE_MAX_FILE_BYTES = int(os.getenv("FILE_CACHE_MAX_FILE_BYTES", 16 * 1024**2))
+# How long a cached file is served before checking it still exists in GridFS.
+FILE_CACHE_REVALIDATE_SECONDS = float(os.getenv("FILE_CACHE_REVALIDATE_SECONDS", 60))
+
+CacheKey = Tuple[ObjectId, Optional[str]]  # (file id, variant)
+
+
+class CachedFile:
+    """A GridFS file copied to disk.
+
+    Has the `filename`, `length`, `upload_date` and `metadata` attributes of
+    the GridOut it was read from, so callers can treat both alike.
+    """
+
+    def __init__(self, path: str, stat_result: os.stat_result, grid_out):
+        self.path = path
+        self.stat_result = stat_result
+        self.filename = grid_out.filename
+        self.length = grid_out.length
+        self.upload_date = grid_out.upload_date
+        self.metadata = {"content_type": (grid_out.metadata or {}).get("content_type")}
+        self.checked_at = time.monotonic()
+        self.readers = 0  # responses sending the file; it is not unlinked meanwhile
+        self.dropped = False
+
+
+class CachedFileResponse(FileResponse):
+    """Sends a cached file and keeps it on disk until the response is done."""
+
+    def __init__(self, cache: "FileCache", entry: CachedFile, **kwargs):
+        super().__init__(entry.path, stat_result=entry.stat_result, **kwargs)
+        self._cache = cache
+        self._entry = entry
+        entry.readers += 1
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._cache._release(self._entry)
+
+
+class FileCache:
+    """Byte-bounded LRU of GridFS files on local disk.
+
+    Concurrent misses for the same file share one GridFS read (single flight).
+    """
+
+    def __init__(self, root: str, max_bytes: int, max_file_bytes: int):
+        self.root = root
+        self.directory: Optional[str] = None
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.size = 0
+        self._entries: "OrderedDict[CacheKey, CachedFile]" = OrderedDict()
+        self._filling: Dict[CacheKey, asyncio.Future] = {}
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "fills": 0,
+            "shared_fills": 0,  # misses that waited for another request's fill
+            "uncacheable": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "errors": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def open(self):
+        """Create this worker's cache directory and drop those of dead workers."""
+        if self.max_bytes <= 0:
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            for name in os.listdir(self.root):
+                if name.isdigit() and not _process_alive(int(name)):
+                    shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            directory = os.path.join(self.root, str(os.getpid()))
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+        except OSError as e:
+            logger.warning("File cache disabled, cannot use %s: %s", self.root, e)
+            return
+        self.directory = directory
+
+    def close(self):
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory = None
+        self._entries.clear()
+        self.size = 0
+
+    async def fetch(
+        self, key: CacheKey, open_stream: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return the cached copy of `key`, filling it from `open_stream()` on a miss.
+
+        `open_stream` opens the GridOut (raising 404 if there is none). A file
+        that is not cached (cache disabled, too large, or the copy failed) is
+        returned as that open GridOut instead, to be streamed by the caller.
+        Turn a returned CachedFile into a `response()` before awaiting anything
+        else, or it may be evicted in between.
+        """
+        if not self.enabled:
+            return await open_stream()
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored = await self._still_stored(key, entry)
+                if stored and self._entries.get(key) is entry:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return entry
+                continue
+            pending = self._filling.get(key)
+            if pending is None:
+                break
+            # Another request is copying this file; it is cached once that ends.
+            self.counters["shared_fills"] += 1
+            if not await asyncio.shield(pending):
+                return await open_stream()
+
+        self.counters["misses"] += 1
+        pending = asyncio.get_running_loop().create_future()
+        self._filling[key] = pending
+        filled = False
+        try:
+            grid_out = await open_stream()
+            if grid_out.length > self.max_file_bytes or grid_out.length > self.max_bytes:
+                self.counters["uncacheable"] += 1
+                return grid_out
+            entry = await self._fill(key, grid_out)
+            if entry is None:
+                return await open_stream()
+            filled = True
+            return entry
+        finally:
+            del self._filling[key]
+            pending.set_result(filled)
+
+    async def _fill(self, key: CacheKey, grid_out) -> Optional[CachedFile]:
+        file_id, variant = key
+        name = f"{file_id}.{variant}" if variant else str(file_id)
+        path = os.path.join(self.directory, name)
+        partial = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            async with await anyio.open_file(partial, "wb") as out:
+                while data := await grid_out.read(grid_out.chunk_size):
+                    await out.write(data)
+            os.replace(partial, path)
+            stat_result = os.stat(path)
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning("Could not cache file %s: %s", name, e)
+            _unlink(partial)
+            return None
+        except BaseException:
+            _unlink(partial)
+            raise
+        entry = CachedFile(path, stat_result, grid_out)
+        self._entries[key] = entry
+        self.size += entry.length
+        self.counters["fills"] += 1
+        self._evict()
+        return entry
+
+    async def _still_stored(self, key: CacheKey, entry: CachedFile) -> bool:
+        if time.monotonic() - entry.checked_at < FILE_CACHE_REVALIDATE_SECONDS:
+            return True
+        entry.checked_at = time.monotonic()
+        exists = await get_database()["fs.files"].find_one({"_id": key[0]}, {"_id": 1})
+        if exists is None and self._entries.get(key) is entry:
+            self._drop(key)
+            self.counters["invalidations"] += 1
+        return exists is not None
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.counters["evictions"] += 1
+
+    def _drop(self, key: CacheKey):
+        entry = self._entries.pop(key)
+        self.size -= entry.length
+        entry.dropped = True
+        if not entry.readers:
+            _unlink(entry.path)
+
+    def _release(self, entry: CachedFile):
+        entry.readers -= 1
+        if entry.dropped and not entry.readers:
+            _unlink(entry.path)
+
+    def invalidate(self, file_ids: Iterable[ObjectId]):
+        """Drop every cached copy (original and variants) of `file_ids`."""
+        ids = set(file_ids)
+        for key in [key for key in self._entries if key[0] in ids]:
+            self._drop(key)
+            self.counters["invalidations"] += 1
+
+    def response(self, entry: CachedFile, **kwargs) -> CachedFileResponse:
+        return CachedFileResponse(self, entry, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return dict(
+            self.counters,
+            entries=len(self._entries),
+            bytes=self.size,
+            max_bytes=self.max_bytes,
+            hit_ratio=self.counters["hits"] / lookups if lookups else 0.0,
+            enabled=self.enabled,
+        )
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+file_cache = FileCache(FILE_CACHE_DIR, FILE_CACHE_MAX_BYTES, FILE_CACHE_MAX_FILE_BYTES)
@@ -0,0 +1,104 @@
+import re
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+
+# Sort keys accepted by GET /items; `_id` breaks ties and drives keyset paging.
+ITEM_SORTS: Dict[str, List[Tuple[str, int]]] = {
+    "oldest": [("_id", 1)],
+    "newest": [("_id", -1)],
+    "price": [("price", 1), ("_id", 1)],
+    "-price": [("price", -1), ("_id", -1)],
+    "name": [("name", 1), ("_id", 1)],
+}
+
+# The `in_stock` filter; the partial indexes in app/models.py use the same expression.
+IN_STOCK = {"quantity": {"$gt": 0}}
+
+# (filters used, sort) -> the ItemModel index that serves it. Every query is
+# hinted to its index, so a combination missing here would be a full scan and
+# is rejected instead. The startup query plan check explains each entry.
+ITEM_QUERY_SHAPES: Dict[Tuple[FrozenSet[str], str], str] = {}
+
+
+def _allow(filters: Tuple[str, ...], sorts: Tuple[str, ...], index: str):
+    for sort in sorts:
+        ITEM_QUERY_SHAPES[(frozenset(filters), sort)] = index
+
+
+_allow((), ("oldest", "newest"), "_id_")
+_allow((), ("price", "-price"), "price_id")
+_allow((), ("name",), "name_id")
+_allow(("owner_id",), ("oldest", "newest"), "owner_id_id")
+# A price range is always served by a price-first index, so only the items in
+# the range are read. Sorted by `_id` instead, those are then put in order by
+# a top-k sort bounded by the page size.
+_allow(("price",), ("oldest", "newest", "price", "-price"), "price_id")
+_allow(("in_stock",), ("oldest", "newest"), "in_stock_id_price")
+_allow(("in_stock",), ("price", "-price"), "in_stock_price_id")
+_allow(("in_stock", "price"), ("oldest", "newest", "price", "-price"), "in_stock_price_id")
+_allow(("name_prefix",), ("name",), "name_id")
+
+
+class ItemQuery(NamedTuple):
+    filter: Dict[str, Any]
+    sort: List[Tuple[str, int]]
+    hint: str
+
+
+def _describe(filters: FrozenSet[str], sort: str) -> str:
+    return f"{'+'.join(sorted(filters)) or 'no filter'} sorted by {sort}"
+
+
+def build_item_query(
+    sort: str = "oldest",
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
+    owner_id: Optional[ObjectId] = None,
+    name_prefix: Optional[str] = None,
+) -> ItemQuery:
+    """Translate list filters into a MongoDB query, its sort and its index.
+
+    Raises 400 for unknown sorts and for filter/sort combinations that no
+    index serves (see ITEM_QUERY_SHAPES).
+    """
+    if sort not in ITEM_SORTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown sort '{sort}'. Allowed: {', '.join(ITEM_SORTS)}.",
+        )
+    query: Dict[str, Any] = {}
+    used = set()
+    if min_price is not None or max_price is not None:
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise HTTPException(
+                status_code=400, detail="min_price must not exceed max_price."
+            )
+        query["price"] = {}
+        if min_price is not None:
+            query["price"]["$gte"] = min_price
+        if max_price is not None:
+            query["price"]["$lte"] = max_price
+        used.add("price")
+    if in_stock:
+        query.update(IN_STOCK)
+        used.add("in_stock")
+    if owner_id is not None:
+        query["owner_id"] = owner_id
+        used.add("owner_id")
+    if name_prefix:
+        # An anchored, case-sensitive regex becomes an index range on `name`.
+        query["name"] = {"$regex": f"^{re.escape(name_prefix)}"}
+        used.add("name_prefix")
+
+    shape = (frozenset(used), sort)
+    if shape not in ITEM_QUERY_SHAPES:
+        supported = "; ".join(_describe(*allowed) for allowed in ITEM_QUERY_SHAPES)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported combination: {_describe(*shape)}. Supported: {supported}.",
+        )
+    return ItemQuery(query, ITEM_SORTS[sort], ITEM_QUERY_SHAPES[shape])
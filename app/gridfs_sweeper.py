@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.crud import RELEASE_LAST_REFERENCE, purge_gridfs_files
+from app.database import get_database
+from app.leader import LEADER_RENEW_SECONDS, is_leader
+from app.models import ItemModel, utc_now
+
+
+logger = logging.getLogger(__name__)
+
+
+ORPHAN_SWEEP_ENABLED = os.getenv("ORPHAN_SWEEP_ENABLED", "true").lower() == "true"
+# Files younger than this (or claimed by a duplicate upload more recently) are
+# left alone: they may still be waiting to be associated with an item.
+ORPHAN_GRACE_SECONDS = float(os.getenv("ORPHAN_GRACE_SECONDS", 24 * 3600))
+ORPHAN_SWEEP_BATCH = int(os.getenv("ORPHAN_SWEEP_BATCH", 200))
+# Pause between batches, bounding the load a sweep puts on MongoDB.
+ORPHAN_SWEEP_PAUSE_SECONDS = float(os.getenv("ORPHAN_SWEEP_PAUSE_SECONDS", 1.0))
+# Pause between full passes over fs.files.
+ORPHAN_SWEEP_INTERVAL_SECONDS = float(os.getenv("ORPHAN_SWEEP_INTERVAL_SECONDS", 3600))
+
+sweeper_metrics: Dict[str, Any] = {
+    "passes": 0,
+    "batches": 0,
+    "scanned": 0,
+    "deleted": 0,
+    "deleted_bytes": 0,
+    "errors": 0,
+    "last_pass_seconds": 0.0,
+    "position": None,  # last fs.files _id checked by the running pass
+}
+_sweeper_task: Optional[asyncio.Task] = None
+
+
+async def _linked_file_ids(file_ids) -> set:
+    return set(
+        await ItemModel.get_motor_collection().distinct(
+            "image_ids", {"image_ids": {"$in": file_ids}}
+        )
+    )
+
+
+async def _linking_owners(file_ids) -> Dict[ObjectId, List[str]]:
+    """File id -> the owners of the items linking it, as listed in `owner_ids`."""
+    cursor = ItemModel.get_motor_collection().aggregate(
+        [
+            {"$match": {"image_ids": {"$in": file_ids}}},
+            {"$unwind": "$image_ids"},
+            {"$match": {"image_ids": {"$in": file_ids}}},
+            {"$group": {"_id": "$image_ids", "owners": {"$addToSet": "$owner_id"}}},
+        ]
+    )
+    return {
+        row["_id"]: sorted(str(owner) for owner in row["owners"]) async for row in cursor
+    }
+
+
+async def sweep_batch(after: Optional[ObjectId]) -> Optional[ObjectId]:
+    """Delete the orphans among the next batch of files after `after`.
+
+    Returns the `_id` to resume from, or None once the pass is complete.
+    Variants are skipped here; they go with the file they were rendered from.
+    """
+    files = get_database()["fs.files"]
+    cutoff = utc_now() - timedelta(seconds=ORPHAN_GRACE_SECONDS)
+    id_range: Dict[str, Any] = {"$lt": ObjectId.from_datetime(cutoff)}
+    if after is not None:
+        id_range["$gt"] = after
+    batch = await (
+        files.find(
+            {
+                "_id": id_range,
+                "uploadDate": {"$lt": cutoff},
+                "metadata.variant_of": {"$exists": False},
+                "metadata.claimed_at": {"$not": {"$gte": cutoff}},
+            },
+            {"_id": 1},
+        )
+        .sort("_id", 1)
+        .limit(ORPHAN_SWEEP_BATCH)
+        .to_list(None)
+    )
+    ids = [file_doc["_id"] for file_doc in batch]
+    sweeper_metrics["batches"] += 1
+    sweeper_metrics["scanned"] += len(ids)
+    if ids:
+        sweeper_metrics["position"] = str(ids[-1])
+
+    linked = await _linked_file_ids(ids) if ids else set()
+    orphans = [i for i in ids if i not in linked]
+    if orphans:
+        # Zero the counts so no duplicate upload claims these blobs, then look
+        # again for items that linked one of them in the meantime. Those keep
+        # their data, with one reference per owner whose items link them, but
+        # having left the hash index are no longer shared with later uploads
+        # of the same bytes.
+        unclaimed = {"metadata.claimed_at": {"$not": {"$gte": cutoff}}}
+        await files.update_many(
+            {"_id": {"$in": orphans}, **unclaimed}, RELEASE_LAST_REFERENCE
+        )
+        relinked = await _linking_owners(orphans)
+        if relinked:
+            await files.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": file_id, "metadata.refcount": 0},
+                        {
+                            "$set": {
+                                "metadata.refcount": len(owners),
+                                "metadata.owner_ids": owners,
+                            }
+                        },
+                    )
+                    for file_id, owners in relinked.items()
+                ],
+                ordered=False,
+            )
+        doomed = await files.find(
+            {
+                "_id": {"$in": [i for i in orphans if i not in relinked]},
+                "metadata.refcount": 0,
+                **unclaimed,
+            },
+            {"length": 1, "metadata.variants": 1},
+        ).to_list(None)
+        deleted = await purge_gridfs_files(doomed)
+        freed = sum(file_doc.get("length", 0) for file_doc in doomed)
+        sweeper_metrics["deleted"] += deleted
+        sweeper_metrics["deleted_bytes"] += freed
+        logger.info(
+            "Orphan sweep: deleted %d unreferenced file(s) (%d bytes) up to %s.",
+            len(doomed),
+            freed,
+            ids[-1],
+        )
+    return ids[-1] if len(ids) == ORPHAN_SWEEP_BATCH else None
+
+
+async def sweep_orphans() -> None:
+    """Run one full pass over fs.files, batch by batch."""
+    started = time.monotonic()
+    deleted_before = sweeper_metrics["deleted"]
+    position = None
+    while True:
+        position = await sweep_batch(position)
+        if position is None:
+            break
+        if not is_leader():
+            logger.info("Orphan sweep stopped: another worker runs the background jobs.")
+            sweeper_metrics["position"] = None
+            return
+        await asyncio.sleep(ORPHAN_SWEEP_PAUSE_SECONDS)
+    sweeper_metrics["passes"] += 1
+    sweeper_metrics["position"] = None
+    sweeper_metrics["last_pass_seconds"] = time.monotonic() - started
+    logger.info(
+        "Orphan sweep pass finished in %.1fs, %d file(s) deleted.",
+        sweeper_metrics["last_pass_seconds"],
+        sweeper_metrics["deleted"] - deleted_before,
+    )
+
+
+async def _run_sweeper():
+    while True:
+        if not is_leader():
+            await asyncio.sleep(LEADER_RENEW_SECONDS)
+            continue
+        try:
+            await sweep_orphans()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            sweeper_metrics["errors"] += 1
+            logger.exception("Orphan sweep failed")
+        await asyncio.sleep(ORPHAN_SWEEP_INTERVAL_SECONDS)
+
+
+def start_orphan_sweeper():
+    """Start the background sweeper, unless disabled with ORPHAN_SWEEP_ENABLED.
+
+    It only sweeps while this worker holds the background jobs lease (app.leader).
+    """
+    global _sweeper_task
+    if ORPHAN_SWEEP_ENABLED and _sweeper_task is None:
+        _sweeper_task = asyncio.create_task(_run_sweeper())
+
+
+async def stop_orphan_sweeper():
+    global _sweeper_task
+    if _sweeper_task is None:
+        return
+    _sweeper_task.cancel()
+    try:
+        await _sweeper_task
+    except asyncio.CancelledError:
+        pass
+    _sweeper_task = None
+
+
+def sweeper_stats() -> Dict[str, Any]:
+    return dict(sweeper_metrics, running=_sweeper_task is not None and is_leader())
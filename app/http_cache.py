@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+
+# GridFS file ids never change content, so clients may keep them forever.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against `etag` (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return opaque in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def http_date(value: datetime) -> str:
+    """Format a datetime (naive values are taken as UTC) as an HTTP date."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    """True if `last_modified` is not newer than the If-Modified-Since header."""
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have one second resolution.
+    return last_modified.replace(microsecond=0) <= since
+
+
+def parse_byte_range(range_header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into inclusive (start, end) offsets.
+
+    Returns None when the whole representation should be sent instead: no
+    header, a malformed header, or several ranges (which we do not serve).
+    Raises a 416 when the range lies outside the file.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    first, last = (part.strip() for part in spec.split("-", 1))
+    try:
+        if not first:
+            # Suffix range: the last N bytes.
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(length - suffix, 0), length - 1
+        else:
+            start = int(first)
+            end = int(last) if last else length - 1
+            end = min(end, length - 1)
+            if start > end and start < length:
+                return None
+    except ValueError:
+        return None
+
+    if start >= length or length == 0:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable.",
+            headers={"Content-Range": f"bytes */{length}"},
+        )
+    return start, end
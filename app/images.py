@@ -0,0 +1,101 @@
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+# name:max_edge pairs; each uploaded image gets one resized copy per entry.
+IMAGE_VARIANTS = os.getenv("IMAGE_VARIANTS", "thumb:160,card:480,detail:1200")
+# Output format of the variants, e.g. "webp". Empty keeps JPEG (or PNG for transparency).
+IMAGE_VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "").upper()
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", 82))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+
+
+def parse_variants(spec: str) -> Dict[str, int]:
+    """Parse `thumb:160,card:480` into {"thumb": 160, "card": 480}."""
+    variants = {}
+    for entry in spec.split(","):
+        if entry.strip():
+            name, size = entry.split(":")
+            variants[name.strip()] = int(size)
+    return variants
+
+
+VARIANT_SIZES = parse_variants(IMAGE_VARIANTS)
+
+# Variant -> (bytes, content type, (width, height))
+RenderedVariants = Dict[str, Tuple[bytes, str, Tuple[int, int]]]
+
+
+def render_variants(
+    data: bytes, sizes: Dict[str, int], output_format: str, quality: int
+) -> RenderedVariants:
+    """Resize an encoded image to each of `sizes`. Runs in a worker process."""
+    from PIL import Image, ImageOps
+
+    rendered = {}
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA", "P")
+        fmt = output_format or ("PNG" if has_alpha else "JPEG")
+        for name, max_edge in sizes.items():
+            variant = image.copy()
+            variant.thumbnail((max_edge, max_edge))
+            if fmt == "JPEG" and variant.mode not in ("RGB", "L"):
+                variant = variant.convert("RGB")
+            buffer = io.BytesIO()
+            variant.save(buffer, format=fmt, quality=quality, optimize=True)
+            rendered[name] = (buffer.getvalue(), Image.MIME[fmt], variant.size)
+    return rendered
+
+
+_image_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_image_executor() -> ProcessPoolExecutor:
+    global _image_executor
+    if _image_executor is None:
+        _image_executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _image_executor
+
+
+def is_resizable(content_type: Optional[str]) -> bool:
+    """Whether uploads of this content type get resized variants."""
+    if not VARIANT_SIZES or not content_type:
+        return False
+    return content_type.startswith("image/") and content_type != "image/svg+xml"
+
+
+async def generate_variants(data: bytes) -> RenderedVariants:
+    """Render the configured variants of an image in the process pool.
+
+    Returns an empty dict if the bytes cannot be decoded as an image, so the
+    original is still stored.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            _get_image_executor(),
+            render_variants,
+            data,
+            VARIANT_SIZES,
+            IMAGE_VARIANT_FORMAT,
+            IMAGE_VARIANT_QUALITY,
+        )
+    except Exception as e:
+        logger.warning("Could not generate image variants: %s", e)
+        return {}
+
+
+def shutdown_image_workers():
+    "Shut down the resize process pool. Called when the app stops."
+    global _image_executor
+    if _image_executor is not None:
+        _image_executor.shutdown(wait=False, cancel_futures=True)
+        _image_executor = None
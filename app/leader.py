@@ -0,0 +1,149 @@
+"""One worker per deployment runs the background jobs.
+
+The orphan sweeper, the release of expired reservations and the first build
+of the item stats only need to run once, not in every gunicorn worker (nor in
+every replica). Workers compete for a lease document in the app_state
+collection: whoever holds it renews it every LEADER_RENEW_SECONDS, and once it
+has gone LEADER_LEASE_SECONDS without renewal (its worker crashed or lost
+MongoDB) another worker takes it over. Jobs call `is_leader()` before each
+run.
+
+A worker stops considering itself the leader one renewal interval before its
+lease expires, so with clocks within that margin of each other two workers
+never both run the jobs. Each job stays safe to run twice anyway (releases and
+purges are claimed atomically), as clocks are not guaranteed.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from app.database import APP_STATE_COLLECTION, get_database
+from app.models import utc_now
+
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE_ID = "background_jobs_lease"
+# How long a lease lasts without renewal; a crashed leader is replaced after this.
+LEADER_LEASE_SECONDS = float(os.getenv("LEADER_LEASE_SECONDS", 30))
+LEADER_RENEW_SECONDS = LEADER_LEASE_SECONDS / 3
+
+leader_metrics: Dict[str, Any] = {"elected": 0, "lost": 0, "errors": 0}
+# Set when the election starts: with a preloaded app the module is imported in
+# the gunicorn master, so the pid here would be the same for every worker.
+_worker_id: Optional[str] = None
+_leader_until = 0.0  # monotonic time until which this worker may run the jobs
+_election_task: Optional[asyncio.Task] = None
+_elected_jobs_task: Optional[asyncio.Task] = None
+
+
+def is_leader() -> bool:
+    """Whether this worker currently holds the background jobs lease."""
+    return time.monotonic() < _leader_until
+
+
+async def _take_lease() -> bool:
+    """Take or renew the lease; False while another worker holds it."""
+    now = utc_now()
+    try:
+        await get_database()[APP_STATE_COLLECTION].update_one(
+            {
+                "_id": LEADER_LEASE_ID,
+                "$or": [{"holder": _worker_id}, {"expires_at": {"$lte": now}}],
+            },
+            {
+                "$set": {
+                    "holder": _worker_id,
+                    "expires_at": now + timedelta(seconds=LEADER_LEASE_SECONDS),
+                }
+            },
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # The lease exists and is someone else's, so the upsert tried an insert.
+        return False
+    return True
+
+
+async def _run_elected_jobs(jobs: List[Callable[[], Awaitable[Any]]]) -> bool:
+    try:
+        for job in jobs:
+            await job()
+    except Exception:
+        leader_metrics["errors"] += 1
+        logger.exception("Background job failed after election; retrying")
+        return False
+    return True
+
+
+async def _run_election(on_elected: List[Callable[[], Awaitable[Any]]]):
+    global _leader_until, _elected_jobs_task
+    while True:
+        try:
+            started = time.monotonic()
+            if await _take_lease():
+                if not is_leader():
+                    leader_metrics["elected"] += 1
+                    logger.info("Worker %s now runs the background jobs.", _worker_id)
+                _leader_until = started + LEADER_LEASE_SECONDS - LEADER_RENEW_SECONDS
+                # Run once per term, again only if they failed; off the renewal
+                # loop so that a long job does not let the lease lapse.
+                if _elected_jobs_task is None or (
+                    _elected_jobs_task.done() and not _elected_jobs_task.result()
+                ):
+                    _elected_jobs_task = asyncio.create_task(_run_elected_jobs(on_elected))
+            elif is_leader():
+                _leader_until = 0.0
+                _elected_jobs_task = None
+                leader_metrics["lost"] += 1
+                logger.warning("Worker %s lost the background jobs lease.", _worker_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            leader_metrics["errors"] += 1
+            logger.exception("Could not take the background jobs lease")
+        await asyncio.sleep(LEADER_RENEW_SECONDS)
+
+
+def start_leader_election(on_elected: List[Callable[[], Awaitable[Any]]]):
+    """Compete for the lease; run `on_elected` each time this worker wins it."""
+    global _election_task, _worker_id
+    if _election_task is None:
+        _worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        _election_task = asyncio.create_task(_run_election(on_elected))
+
+
+async def stop_leader_election():
+    """Stop competing and hand the lease over at once if this worker held it."""
+    global _election_task, _elected_jobs_task, _leader_until
+    if _election_task is None:
+        return
+    for task in (_election_task, _elected_jobs_task):
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    _election_task = None
+    _elected_jobs_task = None
+    if is_leader():
+        _leader_until = 0.0
+        try:
+            await get_database()[APP_STATE_COLLECTION].delete_one(
+                {"_id": LEADER_LEASE_ID, "holder": _worker_id}
+            )
+        except Exception as e:
+            logger.warning("Could not release the background jobs lease: %s", e)
+
+
+def leader_stats() -> Dict[str, Any]:
+    return dict(leader_metrics, leader=is_leader(), worker=_worker_id)
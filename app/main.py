@@ -1,25 +1,48 @@
+import logging
+import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from datetime import datetime
+from fastapi import (
+    FastAPI,
+    HTTPException,
+    Depends,
+    UploadFile,
+    File,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse, StreamingResponse
 
 from beanie import PydanticObjectId
+from pydantic import ValidationError
 
 from app.crud import (
+    owner_email_cache,
+    search_cache,
     create_item,
+    bulk_create_items,
+    bulk_update_items,
     get_item,
-    get_all_items,
+    get_items_page,
+    iter_items_export,
+    search_items,
     update_item,
     delete_item,
     upload_file_to_gridfs,
     get_gridfs_file,
+    iter_gridfs_file,
     delete_gridfs_file,
+    delete_stored_files,
     associate_image_with_item,
     disassociate_image_from_item,
+    owns_file,
 )
 from app.models import (
-    ItemModel,
     UserModel,
+    utc_now,
 )
 
 from app.schemas import (
@@ -29,26 +52,90 @@ from app.schemas import (
     Token,
     Login,
     ItemUpdate,
+    ItemBulkUpdate,
+    BulkResult,
     ItemResponse,
+    ItemPage,
+    ItemStats,
+    ReserveRequest,
+    BatchReserveRequest,
+    ReservationResponse,
     FileResponse as AppFileResponse,
 )
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, dump_json, parse_fields
+from app.filters import ITEM_SORTS, build_item_query
+from app.http_cache import (
+    IMMUTABLE_CACHE_CONTROL,
+    etag_matches,
+    http_date,
+    not_modified_since,
+    parse_byte_range,
+)
 from app.database import (
     init_db,
+    close_db,
 )
 from app.auth import (
-    get_password_hash,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
     create_access_token,
     get_current_user,
+    password_hash_stats,
+    shutdown_password_hasher,
+    update_user,
+    user_cache_stats,
 )
-from typing import List, Optional, Dict, Any
+from app.response_cache import cached_json_response, response_cache
+from app.bulk import bulk_openapi, read_bulk_rows
+from app.uploads import multipart_openapi, parse_upload_form
+from app.images import VARIANT_SIZES, shutdown_image_workers
+from app.file_cache import CachedFile, file_cache
+from app.gridfs_sweeper import start_orphan_sweeper, stop_orphan_sweeper, sweeper_stats
+from app.admission import admission_stats, admit_read, admit_upload, admit_write
+from app.stats import ensure_item_stats, get_item_stats
+from app.reservations import (
+    confirm_reservation,
+    release_reservation,
+    reservation_stats,
+    reserve_items,
+    start_reservation_reaper,
+    stop_reservation_reaper,
+)
+from app.leader import leader_stats, start_leader_election, stop_leader_election
+from app.metrics import MetricsMiddleware, metrics_response_body, register_stats
+from typing import Optional
+
+
+# Level of the app's own log messages (background tasks, startup checks).
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+app_logger = logging.getLogger("app")
+if not app_logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(
+        logging.Formatter("%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s")
+    )
+    app_logger.addHandler(_handler)
+app_logger.setLevel(LOG_LEVEL)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle events for FastAPI app."""
     await init_db()
+    # One worker builds missing item stats and runs the sweeper and reaper.
+    start_leader_election(on_elected=[ensure_item_stats])
+    start_orphan_sweeper()
+    start_reservation_reaper()
+    file_cache.open()
     yield
+    await stop_reservation_reaper()
+    await stop_orphan_sweeper()
+    await stop_leader_election()
+    file_cache.close()
+    shutdown_password_hasher()
+    shutdown_image_workers()
+    close_db()
 
 
 app = FastAPI(
@@ -66,6 +153,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+register_stats("password_hash", password_hash_stats)
+register_stats("user_cache", user_cache_stats)
+register_stats("search_cache", search_cache.stats)
+register_stats("owner_email_cache", owner_email_cache.stats)
+register_stats("response_cache", response_cache.stats)
+register_stats("orphan_sweeper", sweeper_stats)
+register_stats("file_cache", file_cache.stats)
+register_stats("reservations", reservation_stats)
+register_stats("admission", admission_stats)
+register_stats("leader", leader_stats)
 
 
 # --- Authentication Endpoints ---
@@ -73,13 +172,20 @@ app.add_middleware(
 async def login(login_data: Login):
     """Login endpoint to authenticate users and return JWT token."""
     user = await UserModel.find_one(UserModel.email == login_data.email)
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if user:
+        valid, new_hash = await verify_password_async(
+            login_data.password, user.hashed_password
+        )
+    if not user or not valid:
         raise HTTPException(
             status_code=400,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": user.email})
+    if new_hash:
+        # The stored hash used an outdated cost factor; replace it transparently.
+        await update_user(user, {UserModel.hashed_password: new_hash})
+    access_token = create_access_token(data={"sub": user.email, "uid": str(user.id)})
     return Token(access_token=access_token, token_type="bearer")
 
 
@@ -91,45 +197,145 @@ async def signup_user(
     existing_user = await UserModel.find_one(UserModel.email == user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     new_user = UserModel(email=user_data.email, hashed_password=hashed_password)
     await new_user.insert()
     return UserResponse(email=new_user.email, is_active=new_user.is_active)
 
 
 # --- Item Endpoints ---
-@app.post("/items", summary="Create a new item")
+@app.post(
+    "/items",
+    summary="Create a new item",
+    openapi_extra=multipart_openapi(ItemCreate, files_field="files"),
+    dependencies=[Depends(admit_upload)],
+)
 async def create_new_item_endpoint(
-    name: str = Form(...),
-    description: Optional[str] = Form(None),
-    price: float = Form(...),
-    quantity: int = Form(...),
-    files: List[UploadFile] = File(
-        default=None, description="Optional images for the item"
-    ),
+    request: Request,
     current_user: UserModel = Depends(get_current_user),
 ):
     """
     Create a new item. You can optionally upload one or more image files.
+    Files are streamed into GridFS while the request is read, several at a
+    time; if the item cannot be created they are removed again.
+    """
+    fields, uploaded_files = await parse_upload_form(
+        request, owner_id=current_user.id, files_field="files"
+    )
+    try:
+        item_data = ItemCreate.model_validate(fields)
+        return await create_item(
+            item_data,
+            owner_id=current_user.id,
+            image_ids=[stored.file_id for stored in uploaded_files],
+        )
+    except ValidationError as e:
+        await delete_stored_files(uploaded_files, current_user.id)
+        raise RequestValidationError(
+            [
+                {**error, "loc": ("body", *error["loc"])}
+                for error in e.errors(include_url=False)
+            ]
+        )
+    except BaseException:
+        await delete_stored_files(uploaded_files, current_user.id)
+        raise
+
+
+@app.post(
+    "/items/bulk",
+    response_model=BulkResult,
+    summary="Create many items",
+    openapi_extra=bulk_openapi(ItemCreate),
+    dependencies=[Depends(admit_write)],
+)
+async def bulk_create_items_endpoint(
+    request: Request, current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Create many items from a JSON array or NDJSON body of item rows.
+    Rows are inserted in one unordered batch; the response reports each row.
+    """
+    rows = await read_bulk_rows(request)
+    return await bulk_create_items(rows, owner_id=current_user.id)
+
+
+@app.patch(
+    "/items/bulk",
+    response_model=BulkResult,
+    summary="Update many items",
+    openapi_extra=bulk_openapi(ItemBulkUpdate),
+    dependencies=[Depends(admit_write)],
+)
+async def bulk_update_items_endpoint(
+    request: Request, current_user: UserModel = Depends(get_current_user)
+):
     """
-    item_data = ItemCreate(
-        name=name, description=description, price=price, quantity=quantity
+    Update many items from a JSON array or NDJSON body. Each row carries the
+    item `id` plus the fields to change. User must own every item; rows for
+    other users' items are reported as `forbidden` and left untouched.
+    """
+    rows = await read_bulk_rows(request)
+    return await bulk_update_items(rows, owner_id=current_user.id)
+
+
+@app.get(
+    "/items/search",
+    response_model=ItemPage,
+    response_model_exclude_unset=True,
+    summary="Search items by name and description (public)",
+    dependencies=[Depends(admit_read)],
+)
+async def search_items_endpoint(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    next: Optional[str] = Query(None, description="Page token from a previous page"),
+    fields: Optional[str] = Query(
+        None, description="Comma separated fields to return, e.g. `name,price`"
+    ),
+):
+    """Full-text search, best matches first. Each result carries its `score`."""
+    field_list = parse_fields(fields)
+    return await cached_json_response(
+        request, lambda: search_items(q, limit, cursor=next, fields=field_list)
     )
-    uploaded_image_ids: List[PydanticObjectId] = []
-    if files:
-        for file_upload in files:
-            if file_upload.filename:
-                file_response = await upload_file_to_gridfs(
-                    file_upload, owner_id=current_user.id
-                )
-                uploaded_image_ids.append(file_response.file_id)
-
-    return await create_item(
-        item_data, owner_id=current_user.id, image_ids=uploaded_image_ids
+
+
+@app.get(
+    "/items/export",
+    summary="Export the catalog as NDJSON or CSV (public)",
+    dependencies=[Depends(admit_read)],
+)
+async def export_items_endpoint(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    updated_since: Optional[datetime] = Query(
+        None, description="Only export items changed at or after this time"
+    ),
+):
+    """
+    Stream every item as NDJSON (default) or CSV without loading the catalog
+    into memory. For incremental pulls, pass the `X-Export-Watermark` header
+    of the previous export as `updated_since`.
+    """
+    watermark = utc_now()
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        iter_items_export(export_format, updated_since),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="items.{export_format}"',
+            "X-Export-Watermark": watermark.isoformat(),
+        },
     )
 
 
-@app.get("/items/{item_id}", response_model=ItemResponse, summary="Get an item by ID")
+@app.get(
+    "/items/{item_id}",
+    response_model=ItemResponse,
+    summary="Get an item by ID",
+    dependencies=[Depends(admit_read)],
+)
 async def read_item_endpoint(
     item_id: str, current_user: UserModel = Depends(get_current_user)
 ):
@@ -145,24 +351,112 @@ async def read_item_endpoint(
     return item
 
 
-@app.get("/items", response_model=List[ItemModel], summary="Get all items (public)")
-async def read_all_items_endpoint():
-    """Retrieve all items. This endpoint is public."""
-    return await get_all_items()
+@app.get(
+    "/items",
+    response_model=ItemPage,
+    response_model_exclude_unset=True,
+    summary="Get all items (public)",
+    dependencies=[Depends(admit_read)],
+)
+async def read_all_items_endpoint(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    next: Optional[str] = Query(None, description="Page token from a previous page"),
+    fields: Optional[str] = Query(
+        None, description="Comma separated fields to return, e.g. `name,price`"
+    ),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = Query(False, description="Only items with quantity above 0"),
+    owner_id: Optional[PydanticObjectId] = Query(None),
+    name_prefix: Optional[str] = Query(
+        None, min_length=1, max_length=100, description="Case-sensitive name prefix"
+    ),
+    sort: str = Query("oldest", description=f"One of: {', '.join(ITEM_SORTS)}"),
+):
+    """Retrieve a page of items. This endpoint is public.
+    Pass the returned `next` token back to fetch the following page.
+    Filters and sorts combine only in ways an index serves; other
+    combinations are rejected with 400.
+    Responses are cached and carry an ETag for cheap revalidation.
+    """
+    field_list = parse_fields(fields)
+    item_query = build_item_query(
+        sort=sort,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+        owner_id=owner_id,
+        name_prefix=name_prefix,
+    )
+    return await cached_json_response(
+        request,
+        lambda: get_items_page(
+            item_query.filter,
+            limit,
+            cursor=next,
+            fields=field_list,
+            public=True,
+            sort=item_query.sort,
+            hint=item_query.hint,
+        ),
+    )
 
 
 @app.get(
     "/user/items",
-    response_model=List[ItemModel],
+    response_model=ItemPage,
+    response_model_exclude_unset=True,
     summary="Get items for the current user",
+    dependencies=[Depends(admit_read)],
 )
-async def read_user_items_endpoint(current_user: UserModel = Depends(get_current_user)):
-    """Retrieve all items owned by the currently authenticated user."""
-    items = await ItemModel.find(ItemModel.owner_id == current_user.id).to_list()
-    return items
+async def read_user_items_endpoint(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    next: Optional[str] = Query(None, description="Page token from a previous page"),
+    fields: Optional[str] = Query(
+        None, description="Comma separated fields to return, e.g. `name,price`"
+    ),
+    current_user: UserModel = Depends(get_current_user),
+):
+    """Retrieve a page of items owned by the currently authenticated user."""
+    page = await get_items_page(
+        {"owner_id": current_user.id},
+        limit,
+        cursor=next,
+        fields=parse_fields(fields),
+    )
+    # Raw documents straight to orjson; `response_model` only documents the shape.
+    return Response(content=dump_json(page), media_type="application/json")
+
+
+@app.get(
+    "/stats",
+    response_model=ItemStats,
+    summary="Catalog inventory stats (public)",
+    dependencies=[Depends(admit_read)],
+)
+async def catalog_stats_endpoint():
+    """Item counts, stock and price bands over the whole catalog.
+    Served from a rollup kept current on every item write."""
+    return await get_item_stats()
+
+
+@app.get(
+    "/user/stats",
+    response_model=ItemStats,
+    summary="Inventory stats for the current user",
+    dependencies=[Depends(admit_read)],
+)
+async def user_stats_endpoint(current_user: UserModel = Depends(get_current_user)):
+    """Item counts, stock and price bands over the current user's items."""
+    return await get_item_stats(current_user.id)
 
 
-@app.put("/items/{item_id}", summary="Update an item")
+@app.put(
+    "/items/{item_id}",
+    summary="Update an item",
+    dependencies=[Depends(admit_write)],
+)
 async def modify_item_endpoint(
     item_id: str,
     item_update_data: ItemUpdate,
@@ -171,6 +465,8 @@ async def modify_item_endpoint(
     """Update an item's details. User must own the item.
     To remove all images, pass `image_ids: []`.
     To change images, pass a new list of `image_ids`.
+    `quantity` is the stock on hand: units held by reservations are kept
+    aside from it, so the item's `quantity` becomes this minus `reserved`.
     """
     update_data_dict = item_update_data.model_dump(exclude_unset=True)
     if not update_data_dict:
@@ -178,7 +474,11 @@ async def modify_item_endpoint(
     return await update_item(item_id, update_data_dict, owner_id=current_user.id)
 
 
-@app.delete("/items/{item_id}", summary="Delete an item")
+@app.delete(
+    "/items/{item_id}",
+    summary="Delete an item",
+    dependencies=[Depends(admit_write)],
+)
 async def remove_item_endpoint(
     item_id: str, current_user: UserModel = Depends(get_current_user)
 ):
@@ -189,7 +489,12 @@ async def remove_item_endpoint(
 # --- File/Image Endpoints ---
 
 
-@app.post("/uploadfile", response_model=AppFileResponse, summary="Upload a single file")
+@app.post(
+    "/uploadfile",
+    response_model=AppFileResponse,
+    summary="Upload a single file",
+    dependencies=[Depends(admit_upload)],
+)
 async def upload_a_file(
     file: UploadFile = File(...), current_user: UserModel = Depends(get_current_user)
 ):
@@ -201,29 +506,83 @@ async def upload_a_file(
     return await upload_file_to_gridfs(file, owner_id=current_user.id)
 
 
-@app.get("/file/{file_id}", summary="Download a file by ID")
+@app.get(
+    "/file/{file_id}",
+    summary="Download a file by ID",
+    dependencies=[Depends(admit_read)],
+)
 async def get_file_by_id(
     file_id: PydanticObjectId,
+    request: Request,
+    variant: Optional[str] = Query(
+        None, description="Resized image variant, e.g. `thumb`, `card`, `detail`"
+    ),
 ):
     """
     Retrieve a file from GridFS by its ID.
     Currently public, add `current_user` dependency and check `grid_out.metadata.get("owner_id")`
     if you want to restrict access.
-    """
-    grid_out = await get_gridfs_file(file_id)
 
-    response = StreamingResponse(
-        grid_out,
-        media_type=grid_out.metadata.get("content_type", "application/octet-stream"),
+    File contents never change for a given ID, so responses carry a strong ETag
+    and long-lived immutable caching headers. Conditional requests are answered
+    with 304 and a single `Range: bytes=...` is answered with 206.
+    """
+    if variant and variant not in VARIANT_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown variant '{variant}'. Available: {', '.join(VARIANT_SIZES)}.",
+        )
+    etag = f'"{file_id}-{variant}"' if variant else f'"{file_id}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    # The ETag is derived from the ID alone, so a revalidation needs no database read.
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # A disk cache hit needs no database read. Otherwise only the file document
+    # is loaded here; chunks are read while copying to disk or streaming.
+    grid_out = await file_cache.fetch(
+        (file_id, variant), lambda: get_gridfs_file(file_id, variant)
     )
+    headers["Last-Modified"] = http_date(grid_out.upload_date)
+    if "if-none-match" not in request.headers and not_modified_since(
+        request.headers.get("if-modified-since"), grid_out.upload_date
+    ):
+        return Response(status_code=304, headers=headers)
+
+    headers["Accept-Ranges"] = "bytes"
     # Set filename for download
-    response.headers["Content-Disposition"] = (
-        f'attachment; filename="{grid_out.filename}"'
+    headers["Content-Disposition"] = f'attachment; filename="{grid_out.filename}"'
+    media_type = grid_out.metadata.get("content_type") or "application/octet-stream"
+    if isinstance(grid_out, CachedFile):
+        # FileResponse answers Range and If-Range requests itself.
+        return file_cache.response(grid_out, media_type=media_type, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range == etag:
+        byte_range = parse_byte_range(request.headers.get("range"), grid_out.length)
+    if byte_range is None:
+        headers["Content-Length"] = str(grid_out.length)
+        return StreamingResponse(
+            iter_gridfs_file(grid_out), media_type=media_type, headers=headers
+        )
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{grid_out.length}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_gridfs_file(grid_out, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
     )
-    return response
 
 
-@app.delete("/file/{file_id}", summary="Delete a file by ID")
+@app.delete(
+    "/file/{file_id}",
+    summary="Delete a file by ID",
+    dependencies=[Depends(admit_write)],
+)
 async def delete_a_file(
     file_id: PydanticObjectId, current_user: UserModel = Depends(get_current_user)
 ):
@@ -240,6 +599,7 @@ async def delete_a_file(
 @app.post(
     "/items/{item_id}/associate-image/{image_id}",
     summary="Associate an image with an item",
+    dependencies=[Depends(admit_write)],
 )
 async def associate_image_endpoint(
     item_id: str,
@@ -250,9 +610,7 @@ async def associate_image_endpoint(
 
     try:
         grid_out = await get_gridfs_file(image_id)
-        if grid_out.metadata and grid_out.metadata.get("owner_id") != str(
-            current_user.id
-        ):
+        if not owns_file(grid_out.metadata, current_user.id):
             raise HTTPException(
                 status_code=403, detail="You do not own this image to associate it."
             )
@@ -269,6 +627,7 @@ async def associate_image_endpoint(
 @app.delete(
     "/items/{item_id}/disassociate-image/{image_id}",
     summary="Disassociate an image from an item",
+    dependencies=[Depends(admit_write)],
 )
 async def disassociate_image_endpoint(
     item_id: str,
@@ -277,3 +636,78 @@ async def disassociate_image_endpoint(
 ):
     """Disassociate an image from an item. This does NOT delete the image from GridFS."""
     return await disassociate_image_from_item(item_id, image_id, current_user.id)
+
+
+# --- Stock reservations ---
+@app.post(
+    "/items/reserve",
+    response_model=ReservationResponse,
+    status_code=201,
+    summary="Reserve stock of several items at once",
+    dependencies=[Depends(admit_write)],
+)
+async def reserve_items_endpoint(
+    body: BatchReserveRequest, current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Reserve units of several items, all or nothing: if any item lacks stock,
+    nothing is reserved and the response is 409. Units are held for the
+    buyer until the reservation is confirmed, released, or expires.
+    """
+    return await reserve_items(
+        [(line.item_id, line.quantity) for line in body.items], current_user.id
+    )
+
+
+@app.post(
+    "/items/{item_id}/reserve",
+    response_model=ReservationResponse,
+    status_code=201,
+    summary="Reserve stock of an item",
+    dependencies=[Depends(admit_write)],
+)
+async def reserve_item_endpoint(
+    item_id: PydanticObjectId,
+    body: ReserveRequest,
+    current_user: UserModel = Depends(get_current_user),
+):
+    """
+    Take `quantity` units off the item's stock for the current user. Answers
+    409 without reserving anything when fewer units are available.
+    """
+    return await reserve_items([(item_id, body.quantity)], current_user.id)
+
+
+@app.post(
+    "/reservations/{reservation_id}/confirm",
+    response_model=ReservationResponse,
+    summary="Confirm a reservation as a purchase",
+    dependencies=[Depends(admit_write)],
+)
+async def confirm_reservation_endpoint(
+    reservation_id: str, current_user: UserModel = Depends(get_current_user)
+):
+    """Confirm a held reservation before it expires; its units stay sold."""
+    return await confirm_reservation(reservation_id, current_user.id)
+
+
+@app.delete(
+    "/reservations/{reservation_id}",
+    response_model=ReservationResponse,
+    summary="Release a reservation",
+    dependencies=[Depends(admit_write)],
+)
+async def release_reservation_endpoint(
+    reservation_id: str, current_user: UserModel = Depends(get_current_user)
+):
+    """Release a held reservation early, returning its units to stock."""
+    return await release_reservation(reservation_id, current_user.id)
+
+
+# --- Monitoring ---
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: request latency per route, in-flight requests,
+    MongoDB command latency, and the app's cache and worker counters."""
+    body, media_type = metrics_response_body()
+    return Response(content=body, media_type=media_type)
@@ -0,0 +1,199 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from pymongo import monitoring
+from starlette.routing import Match
+
+
+# Attach a Server-Timing header with each request's DB time and round trips.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() == "true"
+# Set by app.server when running several workers: metric values are kept in
+# files there so a scrape of any worker reports the sum over all of them.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time to the end of the response, by route template.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled.",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+REQUEST_DB_ROUND_TRIPS = Histogram(
+    "http_request_db_round_trips",
+    "MongoDB commands sent per request.",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency, by collection and command.",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total",
+    "MongoDB commands that failed, by collection and command.",
+    ["collection", "command"],
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# [db_seconds, round_trips] for the request being handled. Motor copies the
+# context into its executor threads, so the command listener sees it.
+_request_db: ContextVar[Optional[List[float]]] = ContextVar("request_db", default=None)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records command latency and adds it to the current request's tally.
+
+    Registered on the client in app.database. Succeeded/failed events carry no
+    command document, so the collection is remembered from the started event.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[Any, int], Tuple[str, Optional[List[float]]]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        name = event.command_name
+        target = event.command.get("collection" if name == "getMore" else name)
+        collection = target if isinstance(target, str) else ""
+        self._pending[(event.connection_id, event.request_id)] = (
+            collection,
+            _request_db.get(),
+        )
+
+    def _finished(self, event, failed: bool):
+        collection, tally = self._pending.pop(
+            (event.connection_id, event.request_id), ("", None)
+        )
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_LATENCY.labels(collection, event.command_name).observe(seconds)
+        if failed:
+            MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+        if tally is not None:
+            tally[0] += seconds
+            tally[1] += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, failed=True)
+
+
+mongo_command_listener = MongoCommandMetrics()
+
+
+class StatsCollector:
+    """Exposes the dicts returned by the app's `*_stats()` helpers as gauges."""
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def add(self, name: str, stats: Callable[[], Dict[str, Any]]):
+        self._sources[name] = stats
+
+    def collect(self):
+        for name, stats in self._sources.items():
+            for key, value in stats().items():
+                if isinstance(value, (int, float)):
+                    yield GaugeMetricFamily(f"mongomart_{name}_{key}", f"{name} {key}", value=value)
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def register_stats(name: str, stats: Callable[[], Dict[str, Any]]):
+    """Publish a stats helper on /metrics as `mongomart_<name>_<key>` gauges."""
+    stats_collector.add(name, stats)
+
+
+def _route_template(app, scope) -> str:
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Per-route latency, in-flight gauges and DB tallies for every HTTP request.
+
+    A plain ASGI middleware, so streamed responses are timed to their last byte
+    and no extra task or body buffering is involved.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = _route_template(scope["app"], scope)
+        method = scope["method"]
+        tally = [0.0, 0]
+        token = _request_db.set(tally)
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    elapsed = (time.perf_counter() - started) * 1000
+                    timing = (
+                        f'db;dur={tally[0] * 1000:.1f};desc="{tally[1]} round trips", '
+                        f"app;dur={elapsed:.1f}"
+                    )
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", timing.encode()),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            in_progress.dec()
+            _request_db.reset(token)
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(
+                time.perf_counter() - started
+            )
+            REQUEST_DB_ROUND_TRIPS.labels(route).observe(tally[1])
+
+
+def metrics_response_body() -> Tuple[bytes, str]:
+    """The Prometheus exposition of every registered metric, and its media type.
+
+    With several workers, request and MongoDB metrics are aggregated across
+    them; the `mongomart_*` stats gauges are those of the answering worker.
+    """
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    registry.register(stats_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,18 +1,57 @@
+from datetime import datetime, timezone
 from beanie import Document, PydanticObjectId
 from pydantic import BaseModel, EmailStr, Field
+from pymongo import ASCENDING, TEXT, IndexModel
 from typing import Optional, List
 
 
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class ItemModel(Document):
     name: str
     description: Optional[str] = None
     price: float
-    quantity: int
+    quantity: int  # units buyers may still reserve
+    # Units taken off `quantity` by held reservations; confirming one sells
+    # them, releasing it puts them back.
+    reserved: int = 0
     owner_id: PydanticObjectId
     image_ids: Optional[List[PydanticObjectId]] = Field(default_factory=list)
+    # Set on every write; lets exports pull only what changed since the last run.
+    updated_at: Optional[datetime] = Field(default_factory=utc_now)
 
     class Settings:
         collection = "mycollection"
+        indexes = [
+            # Owner lookups and the keyset-paginated /user/items listing.
+            IndexModel([("owner_id", ASCENDING), ("_id", ASCENDING)], name="owner_id_id"),
+            # GET /items filters and sorts; app/filters.py maps each allowed
+            # combination to one of these. The partial ones hold in-stock items.
+            IndexModel([("price", ASCENDING), ("_id", ASCENDING)], name="price_id"),
+            IndexModel(
+                [("price", ASCENDING), ("_id", ASCENDING)],
+                name="in_stock_price_id",
+                partialFilterExpression={"quantity": {"$gt": 0}},
+            ),
+            IndexModel(
+                [("_id", ASCENDING), ("price", ASCENDING)],
+                name="in_stock_id_price",
+                partialFilterExpression={"quantity": {"$gt": 0}},
+            ),
+            IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_id"),
+            # Which items link a GridFS file: item deletes and the orphan sweeper.
+            IndexModel([("image_ids", ASCENDING)], name="image_ids"),
+            # Incremental exports (GET /items/export?updated_since=...).
+            IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at_id"),
+            # GET /items/search; a name match ranks well above a description match.
+            IndexModel(
+                [("name", TEXT), ("description", TEXT)],
+                name="name_description_text",
+                weights={"name": 10, "description": 2},
+            ),
+        ]
 
 
 class UserModel(Document):
@@ -22,3 +61,32 @@ class UserModel(Document):
 
     class Settings:
         collection = "users"
+        indexes = [
+            IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        ]
+
+
+class ReservationLine(BaseModel):
+    item_id: PydanticObjectId
+    quantity: int
+
+
+class ReservationModel(Document):
+    """Units taken off items' stock for a buyer until confirmed or expired."""
+
+    user_id: PydanticObjectId
+    lines: List[ReservationLine]
+    status: str = "held"  # held, confirmed or released
+    created_at: datetime = Field(default_factory=utc_now)
+    expires_at: datetime
+
+    class Settings:
+        collection = "reservations"
+        indexes = [
+            # The expiry task looks up held reservations past their deadline.
+            IndexModel(
+                [("expires_at", ASCENDING)],
+                name="held_expires_at",
+                partialFilterExpression={"status": "held"},
+            ),
+        ]
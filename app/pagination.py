@@ -0,0 +1,83 @@
+import base64
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from bson import ObjectId
+from fastapi import HTTPException
+
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 20))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100))
+
+# Fields a client may request through `fields=`. `_id` is always returned.
+ITEM_FIELDS = (
+    "name",
+    "description",
+    "price",
+    "quantity",
+    "owner_id",
+    "image_ids",
+    "owner_email",  # joined from the users collection, not stored on the item
+)
+# What list views get when `fields=` is omitted: no description or image_ids.
+DEFAULT_ITEM_FIELDS = ("name", "price", "quantity", "owner_id")
+
+
+def encode_cursor(last_id: ObjectId, sort_value: Any = None) -> str:
+    """Encode the position after `last_id` as an opaque page token.
+
+    `sort_value` is the last item's value of the sort key when pages are not
+    ordered by `_id` alone; `_id` then breaks ties.
+    """
+    payload = orjson.dumps({"id": str(last_id), "k": sort_value})
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[ObjectId, Any]:
+    """Decode a page token produced by `encode_cursor` into (last_id, sort_value)."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = orjson.loads(base64.urlsafe_b64decode(padded))
+        return ObjectId(payload["id"]), payload.get("k")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid page token.")
+
+
+def keyset_filter(
+    sort: List[Tuple[str, int]], last_id: ObjectId, last_value: Any = None
+) -> Dict[str, Any]:
+    """Condition selecting what comes after (`last_value`, `last_id`) in `sort`.
+
+    `sort` is `[("_id", d)]` or `[(key, d), ("_id", d)]`, both in one direction.
+    """
+    op = "$gt" if sort[-1][1] == 1 else "$lt"
+    if len(sort) == 1:
+        return {"_id": {op: last_id}}
+    key = sort[0][0]
+    return {"$or": [{key: {op: last_value}}, {key: last_value, "_id": {op: last_id}}]}
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Turn a comma separated `fields=` value into a validated field list."""
+    if not fields:
+        return list(DEFAULT_ITEM_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in ITEM_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(unknown)}. "
+            f"Allowed: {', '.join(ITEM_FIELDS)}.",
+        )
+    return requested
+
+
+def dump_json(data: Any) -> bytes:
+    """Serialize raw documents for a list response in a single orjson pass.
+
+    ObjectIds (`_id`, `owner_id`, `image_ids`) become strings inside orjson,
+    so pages skip both a Python walk over every document and response model
+    validation. The endpoints keep `response_model` for the OpenAPI schema.
+    """
+    return orjson.dumps(data, default=str)
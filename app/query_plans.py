@@ -0,0 +1,136 @@
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from beanie import Document
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from app.filters import ITEM_QUERY_SHAPES, build_item_query
+from app.models import ItemModel, ReservationModel, UserModel
+
+
+logger = logging.getLogger(__name__)
+
+
+# off: skip the check, warn: log offending plans, raise: refuse to start.
+QUERY_PLAN_CHECK = os.getenv("QUERY_PLAN_CHECK", "off").lower()
+
+# (name, model, filter, sort) for every query that runs on a hot path.
+# Values only need the right type; the planner does not care what they are.
+HOT_QUERY_SHAPES: List[
+    Tuple[str, Type[Document], Dict[str, Any], Optional[List[Tuple[str, int]]]]
+] = [
+    ("user by email", UserModel, {"email": "probe@example.com"}, None),
+    ("items page", ItemModel, {"_id": {"$gt": ObjectId()}}, [("_id", 1)]),
+    (
+        "items by owner page",
+        ItemModel,
+        {"owner_id": ObjectId(), "_id": {"$gt": ObjectId()}},
+        [("_id", 1)],
+    ),
+    ("items by image", ItemModel, {"image_ids": {"$in": [ObjectId()]}}, None),
+    ("items text search", ItemModel, {"$text": {"$search": "probe"}}, None),
+    (
+        "expired reservations",
+        ReservationModel,
+        {"status": "held", "expires_at": {"$lte": datetime.now(timezone.utc)}},
+        None,
+    ),
+    (
+        "items export since",
+        ItemModel,
+        {"updated_at": {"$gte": datetime.now(timezone.utc)}},
+        [("updated_at", 1), ("_id", 1)],
+    ),
+]
+
+
+# Probe values for the GET /items filters (see app/filters.py).
+ITEM_FILTER_PROBES = {
+    "price": {"min_price": 1.0, "max_price": 2.0},
+    "in_stock": {"in_stock": True},
+    "owner_id": {"owner_id": ObjectId()},
+    "name_prefix": {"name_prefix": "probe"},
+}
+
+
+def item_list_shapes() -> List[Tuple[str, Type[Document], Dict[str, Any], Any, str]]:
+    """Every filter/sort combination GET /items allows, with its hinted index."""
+    shapes = []
+    for (filters, sort), index in ITEM_QUERY_SHAPES.items():
+        params: Dict[str, Any] = {}
+        for name in filters:
+            params.update(ITEM_FILTER_PROBES[name])
+        item_query = build_item_query(sort=sort, **params)
+        label = "+".join(sorted(filters)) or "all"
+        shapes.append(
+            (
+                f"items list {label} by {sort}",
+                ItemModel,
+                item_query.filter,
+                item_query.sort,
+                index,
+            )
+        )
+    return shapes
+
+
+def _plan_stages(plan: Dict[str, Any]) -> Iterator[str]:
+    """Yield every stage name in an explain() plan tree."""
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def explain_stages(
+    model: Type[Document],
+    query: Dict[str, Any],
+    sort: Optional[List[Tuple[str, int]]] = None,
+    hint: Optional[str] = None,
+) -> List[str]:
+    """Return the stages of the winning plan MongoDB picks for `query`."""
+    cursor = model.get_motor_collection().find(query).limit(1)
+    if sort:
+        cursor = cursor.sort(sort)
+    if hint:
+        cursor = cursor.hint(hint)
+    explain = await cursor.explain()
+    return list(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+
+
+async def check_query_plans():
+    """Explain every hot query shape and complain about collection scans."""
+    if QUERY_PLAN_CHECK == "off":
+        return
+
+    offenders = []
+    shapes = [(*shape, None) for shape in HOT_QUERY_SHAPES] + item_list_shapes()
+    for name, model, query, sort, hint in shapes:
+        try:
+            stages = await explain_stages(model, query, sort, hint)
+        except OperationFailure as e:
+            # Typically a hinted index that does not exist.
+            offenders.append(name)
+            logger.warning("Query plan check: '%s' cannot run: %s", name, e)
+            continue
+        if "COLLSCAN" in stages:
+            offenders.append(name)
+            logger.warning(
+                "Query plan check: '%s' on %s is a COLLSCAN (stages: %s). "
+                "Declare an index for it in app/models.py.",
+                name,
+                model.get_collection_name(),
+                " -> ".join(stages),
+            )
+
+    if offenders and QUERY_PLAN_CHECK == "raise":
+        raise RuntimeError(
+            f"Unindexed hot queries: {', '.join(offenders)}. "
+            f"Set QUERY_PLAN_CHECK=warn to start anyway."
+        )
@@ -0,0 +1,383 @@
+"""Stock reservations: take units off items' stock for a buyer, then confirm.
+
+Each reserved item is one conditional `$inc` (`quantity >= n`) moving units
+from the item's `quantity` to its `reserved` counter, so concurrent
+buyers of the same item never oversell and never wait on a lock: whoever
+arrives once the stock is gone gets a 409. To report how many units are left,
+a failed reservation reads the item's quantity: concurrent losers share one
+read, and the figure is remembered for RESERVATION_SOLD_OUT_CACHE_SECONDS, so
+the rest of a crowd on a sold-out item is turned away without reaching
+MongoDB at all.
+
+Confirming a reservation takes its units off `reserved` for good; releasing
+it moves them back to `quantity`. Owners set the stock on hand, and their
+writes subtract `reserved` (crud.item_update), so restocking an item never
+undoes what held reservations took.
+
+A multi-item reservation is all or nothing: units already taken for it are
+put back when another line cannot be reserved. Held reservations that are not
+confirmed within RESERVATION_TTL_SECONDS are released back to stock by a
+background task in the worker holding the background jobs lease (app.leader);
+releases are claimed atomically, so even if two workers overlap during a
+lease handover each reservation is released once. A crash between taking
+stock and recording the reservation (or between claiming a release or
+confirmation and updating the items) leaves those units counted in the
+item's `reserved` until it is corrected by hand.
+
+Rollup deltas and the catalog version bump are batched and applied by each
+worker every RESERVATION_FLUSH_SECONDS rather than per reservation.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+
+from app.cache import TTLCache
+from app.crud import catalog_changed
+from app.leader import is_leader
+from app.models import ItemModel, ReservationLine, ReservationModel, utc_now
+from app.stats import defer_stats_delta, flush_stats_deltas, stats_delta
+
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_TTL_SECONDS = float(os.getenv("RESERVATION_TTL_SECONDS", 15 * 60))
+RESERVATION_MAX_ITEMS = int(os.getenv("RESERVATION_MAX_ITEMS", 50))
+# How stale the stock of a sold-out item may be when rejecting without a query.
+RESERVATION_SOLD_OUT_CACHE_SECONDS = float(
+    os.getenv("RESERVATION_SOLD_OUT_CACHE_SECONDS", 1.0)
+)
+# Rollups and cached catalog reads lag reservations by at most this long.
+RESERVATION_FLUSH_SECONDS = float(os.getenv("RESERVATION_FLUSH_SECONDS", 1.0))
+# How often expired reservations are looked for, and how many per query.
+RESERVATION_SWEEP_INTERVAL_SECONDS = float(
+    os.getenv("RESERVATION_SWEEP_INTERVAL_SECONDS", 10)
+)
+RESERVATION_SWEEP_BATCH = int(os.getenv("RESERVATION_SWEEP_BATCH", 500))
+
+# item id -> quantity last seen when a reservation failed.
+sold_out_cache = TTLCache(maxsize=10000, ttl=RESERVATION_SOLD_OUT_CACHE_SECONDS)
+
+reservation_metrics: Dict[str, Any] = {
+    "reserved": 0,
+    "rejected": 0,
+    "rejected_cached": 0,  # rejected from sold_out_cache, without a query
+    "confirmed": 0,
+    "released": 0,
+    "expired": 0,
+    "errors": 0,
+}
+_catalog_dirty = False
+# item id -> the read of its quantity shared by concurrent failed reservations.
+_stock_reads: Dict[ObjectId, asyncio.Future] = {}
+_reaper_task: Optional[asyncio.Task] = None
+
+_STOCK_PROJECTION = {"owner_id": 1, "price": 1, "quantity": 1}
+
+
+def _stock_changed(doc: Dict[str, Any], change: int):
+    """Record that `doc` (as it is after the write) gained `change` units."""
+    global _catalog_dirty
+    before = dict(doc, quantity=doc["quantity"] - change)
+    defer_stats_delta(doc["owner_id"], stats_delta(before, doc))
+    _catalog_dirty = True
+
+
+async def _take_stock(item_id: ObjectId, quantity: int) -> Optional[Dict[str, Any]]:
+    """Take `quantity` units of an item; None if it has fewer."""
+    doc = await ItemModel.get_motor_collection().find_one_and_update(
+        {"_id": item_id, "quantity": {"$gte": quantity}},
+        {
+            "$inc": {"quantity": -quantity, "reserved": quantity},
+            "$set": {"updated_at": utc_now()},
+        },
+        projection=_STOCK_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is not None:
+        _stock_changed(doc, -quantity)
+    return doc
+
+
+async def _read_stock(item_id: ObjectId) -> Optional[int]:
+    doc = await ItemModel.get_motor_collection().find_one(
+        {"_id": item_id}, {"quantity": 1}
+    )
+    if doc is None:
+        return None
+    sold_out_cache.set(item_id, doc["quantity"])
+    return doc["quantity"]
+
+
+async def _stock_left(item_id: ObjectId) -> Optional[int]:
+    """Quantity of an item a reservation failed on; None if it is gone."""
+    pending = _stock_reads.get(item_id)
+    if pending is None:
+        pending = asyncio.ensure_future(_read_stock(item_id))
+        _stock_reads[item_id] = pending
+        pending.add_done_callback(lambda _: _stock_reads.pop(item_id, None))
+    return await asyncio.shield(pending)
+
+
+async def _restock(lines: List[Tuple[ObjectId, int]]):
+    """Put units back; items deleted meanwhile are skipped."""
+    items = ItemModel.get_motor_collection()
+    for item_id, quantity in lines:
+        doc = await items.find_one_and_update(
+            {"_id": item_id},
+            {
+                "$inc": {"quantity": quantity, "reserved": -quantity},
+                "$set": {"updated_at": utc_now()},
+            },
+            projection=_STOCK_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+        sold_out_cache.pop(item_id)
+        if doc is not None:
+            _stock_changed(doc, quantity)
+
+
+def _merge_lines(lines: List[Tuple[ObjectId, int]]) -> Dict[ObjectId, int]:
+    merged: Dict[ObjectId, int] = {}
+    for item_id, quantity in lines:
+        merged[item_id] = merged.get(item_id, 0) + quantity
+    return merged
+
+
+def _not_enough(item_id: ObjectId, available: int, wanted: int) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Not enough stock of item {item_id}: "
+        f"{max(available, 0)} available, {wanted} requested.",
+    )
+
+
+def reservation_response(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """API shape of a raw reservation document."""
+    expires_at = doc["expires_at"]
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return {
+        "id": str(doc["_id"]),
+        "status": doc["status"],
+        "items": doc["lines"],
+        "expires_at": expires_at,
+    }
+
+
+async def reserve_items(
+    lines: List[Tuple[ObjectId, int]], user_id: ObjectId
+) -> Dict[str, Any]:
+    """Reserve every (item id, quantity) line for `user_id`, or none of them.
+
+    Lines for the same item are added up. Raises 404 for an unknown item and
+    409 when an item has fewer units than requested.
+    """
+    wanted = _merge_lines(lines)
+    if len(wanted) > RESERVATION_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {RESERVATION_MAX_ITEMS} items per reservation.",
+        )
+    for item_id, quantity in wanted.items():
+        known = sold_out_cache.get(item_id)
+        if known is not None and known < quantity:
+            reservation_metrics["rejected"] += 1
+            reservation_metrics["rejected_cached"] += 1
+            raise _not_enough(item_id, known, quantity)
+
+    # Different items are independent documents, so take them concurrently.
+    results = await asyncio.gather(
+        *(_take_stock(item_id, quantity) for item_id, quantity in wanted.items()),
+        return_exceptions=True,
+    )
+    taken = [
+        (item_id, quantity)
+        for (item_id, quantity), result in zip(wanted.items(), results)
+        if isinstance(result, dict)
+    ]
+    if len(taken) < len(wanted):
+        await _restock(taken)
+        reservation_metrics["rejected"] += 1
+        for result in results:
+            if isinstance(result, BaseException):
+                reservation_metrics["errors"] += 1
+                raise result
+        item_id, quantity = next(
+            (item_id, quantity)
+            for (item_id, quantity), result in zip(wanted.items(), results)
+            if result is None
+        )
+        available = await _stock_left(item_id)
+        if available is None:
+            raise HTTPException(status_code=404, detail=f"Item {item_id} not found.")
+        raise _not_enough(item_id, available, quantity)
+
+    reservation = ReservationModel(
+        user_id=user_id,
+        lines=[
+            ReservationLine(item_id=item_id, quantity=quantity)
+            for item_id, quantity in wanted.items()
+        ],
+        expires_at=utc_now() + timedelta(seconds=RESERVATION_TTL_SECONDS),
+    )
+    try:
+        await reservation.insert()
+    except BaseException:
+        await _restock(taken)
+        raise
+    reservation_metrics["reserved"] += 1
+    return reservation_response(
+        {"_id": reservation.id, **reservation.model_dump(exclude={"id"})}
+    )
+
+
+async def _conflict(reservation_id: ObjectId, user_id: ObjectId) -> HTTPException:
+    """Why a held-reservation update matched nothing: 404, or 409 with its state."""
+    doc = await ReservationModel.get_motor_collection().find_one(
+        {"_id": reservation_id, "user_id": user_id}, {"status": 1}
+    )
+    if doc is None:
+        return HTTPException(status_code=404, detail="Reservation not found.")
+    state = "expired" if doc["status"] == "held" else f"already {doc['status']}"
+    return HTTPException(status_code=409, detail=f"Reservation is {state}.")
+
+
+def _reservation_id(reservation_id: str) -> ObjectId:
+    if not ObjectId.is_valid(reservation_id):
+        raise HTTPException(status_code=404, detail="Reservation not found.")
+    return ObjectId(reservation_id)
+
+
+async def confirm_reservation(reservation_id: str, user_id: ObjectId) -> Dict[str, Any]:
+    """Turn a held, unexpired reservation into a purchase; its units stay taken."""
+    oid = _reservation_id(reservation_id)
+    confirmed = await ReservationModel.get_motor_collection().find_one_and_update(
+        {
+            "_id": oid,
+            "user_id": user_id,
+            "status": "held",
+            "expires_at": {"$gt": utc_now()},
+        },
+        {"$set": {"status": "confirmed"}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if confirmed is None:
+        raise await _conflict(oid, user_id)
+    # The units are sold: they stop being held (quantity already excludes them).
+    await ItemModel.get_motor_collection().bulk_write(
+        [
+            UpdateOne({"_id": line["item_id"]}, {"$inc": {"reserved": -line["quantity"]}})
+            for line in confirmed["lines"]
+        ],
+        ordered=False,
+    )
+    reservation_metrics["confirmed"] += 1
+    return reservation_response(confirmed)
+
+
+async def _release(query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Claim the held reservation matching `query` as released and restock it.
+
+    Returns the released document, or None if there was no such reservation.
+    """
+    released = await ReservationModel.get_motor_collection().find_one_and_update(
+        {**query, "status": "held"},
+        {"$set": {"status": "released"}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if released is not None:
+        await _restock([(line["item_id"], line["quantity"]) for line in released["lines"]])
+        reservation_metrics["released"] += 1
+    return released
+
+
+async def release_reservation(reservation_id: str, user_id: ObjectId) -> Dict[str, Any]:
+    """Cancel a held reservation, putting its units back in stock."""
+    oid = _reservation_id(reservation_id)
+    released = await _release({"_id": oid, "user_id": user_id})
+    if released is None:
+        raise await _conflict(oid, user_id)
+    return reservation_response(released)
+
+
+async def release_expired_reservations() -> int:
+    """Release every held reservation past its deadline; return how many."""
+    count = 0
+    while True:
+        expired = await (
+            ReservationModel.get_motor_collection()
+            .find({"status": "held", "expires_at": {"$lte": utc_now()}}, {"_id": 1})
+            .limit(RESERVATION_SWEEP_BATCH)
+            .to_list(None)
+        )
+        for doc in expired:
+            if await _release({"_id": doc["_id"]}) is not None:
+                count += 1
+        if len(expired) < RESERVATION_SWEEP_BATCH:
+            break
+    reservation_metrics["expired"] += count
+    return count
+
+
+async def flush_reservation_changes():
+    """Apply the deferred rollup deltas and invalidate cached catalog reads."""
+    global _catalog_dirty
+    if _catalog_dirty:
+        _catalog_dirty = False
+        await catalog_changed()
+    await flush_stats_deltas()
+
+
+async def _run_reaper():
+    next_sweep = time.monotonic()
+    while True:
+        try:
+            if time.monotonic() >= next_sweep and is_leader():
+                next_sweep = time.monotonic() + RESERVATION_SWEEP_INTERVAL_SECONDS
+                expired = await release_expired_reservations()
+                if expired:
+                    logger.info("Released %d expired reservation(s).", expired)
+            await flush_reservation_changes()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            reservation_metrics["errors"] += 1
+            logger.exception("Reservation upkeep failed")
+        await asyncio.sleep(RESERVATION_FLUSH_SECONDS)
+
+
+def start_reservation_reaper():
+    """Start flushing this worker's deferred changes and, while it holds the
+    background jobs lease, releasing expired reservations."""
+    global _reaper_task
+    if _reaper_task is None:
+        _reaper_task = asyncio.create_task(_run_reaper())
+
+
+async def stop_reservation_reaper():
+    global _reaper_task
+    if _reaper_task is None:
+        return
+    _reaper_task.cancel()
+    try:
+        await _reaper_task
+    except asyncio.CancelledError:
+        pass
+    _reaper_task = None
+    await flush_reservation_changes()
+
+
+def reservation_stats() -> Dict[str, Any]:
+    return dict(
+        reservation_metrics,
+        sold_out_cached=len(sold_out_cache),
+        running=_reaper_task is not None,
+    )
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Request, Response
+from pymongo import ReturnDocument
+
+from app.cache import TTLCache
+from app.database import APP_STATE_COLLECTION, get_database
+from app.http_cache import etag_matches
+from app.pagination import dump_json
+
+
+logger = logging.getLogger(__name__)
+
+# Which ResponseCacheBackend stores cached bodies; see `backends` below.
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 2000))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 10))
+# How long a worker reuses the shared catalog version before reading it again:
+# the longest it serves cached reads (or answers 304) after another worker
+# changed the catalog.
+CATALOG_VERSION_TTL_SECONDS = float(os.getenv("CATALOG_VERSION_TTL_SECONDS", 1.0))
+
+# Clients must revalidate, which is a cheap 304 while the body is unchanged.
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+class ResponseCacheBackend(ABC):
+    """Storage for cached response bodies, keyed by version and request.
+
+    Methods are async so that an external store (Redis, memcached) can be
+    added as another subclass without touching the endpoints.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, body: bytes, ttl: float):
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryResponseCache(ResponseCacheBackend):
+    """Per-process LRU backend; needs no external service."""
+
+    def __init__(self):
+        self._cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, body: bytes, ttl: float):
+        self._cache.set(key, body, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+backends = {"memory": MemoryResponseCache}
+response_cache: ResponseCacheBackend = backends[RESPONSE_CACHE_BACKEND]()
+
+# The catalog version is a counter document shared by every worker, bumped on
+# each item write (crud.catalog_changed). Cache keys embed it, so a write in
+# any worker makes older entries unreachable everywhere within
+# CATALOG_VERSION_TTL_SECONDS. The epoch, set when the document is created,
+# keeps entries cached before a reset of the counter from being served again.
+CATALOG_VERSION_ID = "catalog_version"
+
+_catalog_version: Optional[str] = None
+_catalog_version_read_at = 0.0
+_catalog_version_lock = asyncio.Lock()
+
+
+def _remember_version(doc: Optional[Dict[str, Any]]):
+    global _catalog_version, _catalog_version_read_at
+    _catalog_version = f"{doc['epoch']}.{doc['version']}" if doc else "0.0"
+    _catalog_version_read_at = time.monotonic()
+
+
+async def bump_catalog_version():
+    """Mark every cached catalog response, in every worker, as stale.
+
+    Best effort: if the counter cannot be updated the failure is logged, and
+    other workers serve their cached reads until their entries expire.
+    """
+    global _catalog_version_read_at
+    try:
+        doc = await get_database()[APP_STATE_COLLECTION].find_one_and_update(
+            {"_id": CATALOG_VERSION_ID},
+            {"$inc": {"version": 1}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except Exception as e:
+        logger.warning("Could not bump the catalog version: %s", e)
+        # Re-read on the next request rather than trust the old value.
+        _catalog_version_read_at = 0.0
+        return
+    _remember_version(doc)
+
+
+async def catalog_version() -> str:
+    """The shared catalog version, re-read at most every CATALOG_VERSION_TTL_SECONDS."""
+    if time.monotonic() - _catalog_version_read_at < CATALOG_VERSION_TTL_SECONDS:
+        return _catalog_version
+    async with _catalog_version_lock:
+        # Concurrent requests wait for one read instead of each sending theirs.
+        if time.monotonic() - _catalog_version_read_at >= CATALOG_VERSION_TTL_SECONDS:
+            _remember_version(
+                await get_database()[APP_STATE_COLLECTION].find_one(
+                    {"_id": CATALOG_VERSION_ID}
+                )
+            )
+    return _catalog_version
+
+
+def _request_key(request: Request) -> str:
+    """Path plus query parameters in a canonical order."""
+    params = sorted((k, v) for k, v in request.query_params.multi_items() if v != "")
+    return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in params)
+
+
+async def cached_json_response(
+    request: Request, produce: Callable[[], Awaitable[Any]]
+) -> Response:
+    """Serve a public catalog read from the response cache.
+
+    Returns the cached body or calls `produce()` and caches its JSON, and
+    answers If-None-Match with 304 while that body is unchanged. `produce`
+    returns raw documents or other data `dump_json` accepts.
+
+    The ETag is a hash of the body rather than of the catalog version: with
+    PUBLIC_READ_PREFERENCE on a lagging secondary, a body read just after a
+    write may predate it although it is cached under the new version. Such a
+    body is replaced once it expires from the cache, and its ETag with it.
+    """
+    key = f"{await catalog_version()}:{_request_key(request)}"
+    body = await response_cache.get(key)
+    if body is None:
+        body = dump_json(await produce())
+        await response_cache.set(key, body, RESPONSE_CACHE_TTL_SECONDS)
+    etag = f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,6 +1,7 @@
-from typing import Optional, List
+from datetime import datetime
+from typing import Dict, Optional, List
 from beanie import PydanticObjectId
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, PrivateAttr
 
 
 class ItemCreate(BaseModel):
@@ -14,20 +15,88 @@ class ItemUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     price: Optional[float] = None
+    # Units on hand, reserved ones included; see crud.item_update.
     quantity: Optional[int] = None
     image_ids: Optional[List[PydanticObjectId]] = None
 
 
+class ItemBulkUpdate(ItemUpdate):
+    id: str
+
+
+class BulkRowResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    status: str  # created, updated, invalid, not_found, forbidden or error
+    error: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkRowResult]
+
+
 class ItemResponse(BaseModel):
     id: str
     name: str
     description: Optional[str]
     price: float
-    quantity: int
+    quantity: int  # units that may still be reserved
+    reserved: int = 0  # units held by reservations, not counted in `quantity`
     owner_email: Optional[EmailStr]
     image_ids: Optional[List[PydanticObjectId]]
 
 
+class ItemSummary(BaseModel):
+    """An item as returned by list endpoints; only requested fields are set."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: str = Field(alias="_id")
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    quantity: Optional[int] = None
+    owner_id: Optional[str] = None
+    owner_email: Optional[str] = None
+    image_ids: Optional[List[str]] = None
+    score: Optional[float] = None  # text search relevance, search results only
+
+
+class ItemPage(BaseModel):
+    items: List[ItemSummary]
+    next: Optional[str] = None
+
+
+class ItemStats(BaseModel):
+    items: int
+    units: int
+    stock_value: float  # sum of price * quantity
+    out_of_stock: int
+    price_bands: Dict[str, int]  # item count per price band, e.g. "10-50"
+
+
+class ReserveRequest(BaseModel):
+    quantity: int = Field(1, ge=1)
+
+
+class ReserveLine(BaseModel):
+    item_id: PydanticObjectId
+    quantity: int = Field(1, ge=1)
+
+
+class BatchReserveRequest(BaseModel):
+    items: List[ReserveLine] = Field(min_length=1)
+
+
+class ReservationResponse(BaseModel):
+    id: str
+    status: str  # held, confirmed or released
+    items: List[ReserveLine]
+    expires_at: datetime
+
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
@@ -54,4 +123,8 @@ class FileResponse(BaseModel):
     content_type: str
     upload_date: str
     length: int
+    variants: Dict[str, PydanticObjectId] = Field(default_factory=dict)
     message: str = "File uploaded successfully"
+    # False when the upload matched a blob the uploader already owned, so
+    # rolling it back must not release their existing reference.
+    _added_reference: bool = PrivateAttr(default=True)
@@ -0,0 +1,120 @@
+"""Production entry point: `python -m app.server`.
+
+Runs gunicorn with SERVER_WORKERS uvicorn workers on uvloop and httptools.
+The app is imported once in the master (preload), so routes, dependency
+graphs and the OpenAPI schema are built before forking and shared by every
+worker. Nothing connects to MongoDB until each worker's lifespan runs
+(see app.database.init_db), so no client or pool crosses the fork.
+
+Background jobs (orphan sweeper, expired reservations, first item stats
+build) run in one worker only, elected through a lease in MongoDB (see
+app.leader). Everything else is per worker, and workers do not tell each
+other about writes:
+
+- user cache (app.auth): another worker may keep accepting a user's old
+  record for up to USER_CACHE_TTL_SECONDS after it changes;
+- search and response caches: keyed by the shared catalog version, so an
+  item write is seen by every worker within CATALOG_VERSION_TTL_SECONDS;
+- owner email cache: up to OWNER_EMAIL_CACHE_TTL_SECONDS behind;
+- file cache: each worker has its own copies and byte budget, and notices a
+  file purged elsewhere within FILE_CACHE_REVALIDATE_SECONDS;
+- rate limits and admission slots: per worker, so the effective limits are
+  multiplied by SERVER_WORKERS.
+"""
+
+import glob
+import os
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 8000))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", 0)) or os.cpu_count() or 1
+# Idle keep-alive connections are closed after this long. Keep it above the
+# idle timeout of any load balancer in front, or it may reuse a closed socket.
+SERVER_KEEP_ALIVE_SECONDS = int(os.getenv("SERVER_KEEP_ALIVE_SECONDS", 75))
+# On SIGTERM, workers stop accepting and get this long to finish in-flight requests.
+SERVER_GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", 30))
+# A worker that stops answering the master's heartbeat for this long is restarted.
+SERVER_WORKER_TIMEOUT_SECONDS = int(os.getenv("SERVER_WORKER_TIMEOUT_SECONDS", 60))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", 2048))
+# Recycle a worker after this many requests (plus jitter); 0 never recycles.
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", 0))
+
+
+class AppWorker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": "httptools",
+        "lifespan": "on",
+        "timeout_graceful_shutdown": SERVER_GRACEFUL_TIMEOUT_SECONDS,
+    }
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges from the shared metrics directory.
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app.main import app
+
+        app.openapi()
+        return app
+
+
+def prepare_metrics_dir():
+    """Point prometheus_client at a directory shared by all workers.
+
+    Without PROMETHEUS_MULTIPROC_DIR a fresh temporary one is created. A
+    directory given by the operator may hold other files, so only the metric
+    files of an earlier run (`*.db`) are removed from it. Must run before the
+    app (and with it every metric) is imported.
+    """
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not metrics_dir:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(
+            prefix="mongomart-metrics-"
+        )
+        return
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+        os.remove(path)
+
+
+def main():
+    prepare_metrics_dir()
+    Server(
+        {
+            "bind": f"{SERVER_HOST}:{SERVER_PORT}",
+            "workers": SERVER_WORKERS,
+            "worker_class": "app.server.AppWorker",
+            "preload_app": True,
+            "keepalive": SERVER_KEEP_ALIVE_SECONDS,
+            "graceful_timeout": SERVER_GRACEFUL_TIMEOUT_SECONDS,
+            "timeout": SERVER_WORKER_TIMEOUT_SECONDS,
+            "backlog": SERVER_BACKLOG,
+            "max_requests": SERVER_MAX_REQUESTS,
+            "max_requests_jitter": SERVER_MAX_REQUESTS // 10,
+            "child_exit": child_exit,
+            "accesslog": "-",
+        }
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Inventory rollups: item counts, stock and price bands per owner and overall.
+
+One document per owner plus one for the whole catalog, kept current by the
+item writes in app.crud with `$inc` deltas, so reading stats is a single
+`_id` lookup however large the catalog is. `compute_item_stats` derives the
+same figures from the items with a `$group` pipeline; `python -m app.stats
+verify` compares the two and `python -m app.stats rebuild` replaces the
+rollups with freshly computed ones. Deltas of item writes made while a rebuild
+scans the items are lost, so rebuild while writes are stopped.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.database import get_database
+from app.models import ItemModel
+
+
+logger = logging.getLogger(__name__)
+
+ITEM_STATS_COLLECTION = "item_stats"
+# Where a rebuild writes the new rollups before swapping them in.
+ITEM_STATS_REBUILD_COLLECTION = "item_stats_rebuild"
+CATALOG_STATS_ID = "catalog"
+# Upper bounds of the price bands; the last band is open ended.
+PRICE_BANDS = [
+    float(bound) for bound in os.getenv("PRICE_BANDS", "10,50,100,500").split(",")
+]
+# Relative difference tolerated between stored and recomputed stock values,
+# which are float sums built up in a different order.
+STOCK_VALUE_TOLERANCE = 1e-9
+
+COUNTERS = ("items", "units", "stock_value", "out_of_stock")
+
+
+def _bound_label(bound: float) -> str:
+    # Field names may not contain dots.
+    return f"{bound:g}".replace(".", "_")
+
+
+PRICE_BAND_LABELS = [
+    f"{_bound_label(low)}-{_bound_label(high)}"
+    for low, high in zip([0.0] + PRICE_BANDS, PRICE_BANDS)
+] + [f"{_bound_label(PRICE_BANDS[-1])}+"]
+
+
+def price_band(price: float) -> str:
+    for label, bound in zip(PRICE_BAND_LABELS, PRICE_BANDS):
+        if price < bound:
+            return label
+    return PRICE_BAND_LABELS[-1]
+
+
+def item_contribution(item: Optional[Any]) -> Dict[str, float]:
+    """What one item adds to its rollups. `item` is a model or a raw document."""
+    if item is None:
+        return {}
+    get = item.get if isinstance(item, dict) else lambda key: getattr(item, key, None)
+    price = get("price") or 0
+    quantity = get("quantity") or 0
+    return {
+        "items": 1,
+        "units": quantity,
+        "stock_value": price * quantity,
+        "out_of_stock": 1 if quantity <= 0 else 0,
+        f"price_bands.{price_band(price)}": 1,
+    }
+
+
+def stats_delta(before: Optional[Any], after: Optional[Any]) -> Dict[str, float]:
+    """The `$inc` that turns rollups containing `before` into ones containing `after`."""
+    delta = item_contribution(after)
+    for key, value in item_contribution(before).items():
+        delta[key] = delta.get(key, 0) - value
+    return {key: value for key, value in delta.items() if value}
+
+
+def _collection():
+    return get_database()[ITEM_STATS_COLLECTION]
+
+
+async def apply_stats_deltas(deltas: List[Tuple[ObjectId, Dict[str, float]]]):
+    """Add per-owner deltas to the owner and catalog rollups in one bulk write.
+
+    Best effort: a failure is logged, and `rebuild` repairs any drift.
+    """
+    per_owner: Dict[ObjectId, Dict[str, float]] = {}
+    catalog: Dict[str, float] = {}
+    for owner_id, delta in deltas:
+        owner_delta = per_owner.setdefault(owner_id, {})
+        for key, value in delta.items():
+            owner_delta[key] = owner_delta.get(key, 0) + value
+            catalog[key] = catalog.get(key, 0) + value
+    operations = [
+        UpdateOne({"_id": _id}, {"$inc": delta}, upsert=True)
+        for _id, delta in [*per_owner.items(), (CATALOG_STATS_ID, catalog)]
+        if any(delta.values())
+    ]
+    if not operations:
+        return
+    try:
+        await _collection().bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.warning("Could not update item stats: %s", e)
+
+
+async def apply_stats_delta(owner_id: ObjectId, delta: Dict[str, float]):
+    await apply_stats_deltas([(owner_id, delta)])
+
+
+# Deltas of high-rate writes (stock reservations), summed per owner here and
+# written by `flush_stats_deltas` instead of two rollup updates per request.
+_deferred_deltas: Dict[ObjectId, Dict[str, float]] = {}
+
+
+def defer_stats_delta(owner_id: ObjectId, delta: Dict[str, float]):
+    owner_delta = _deferred_deltas.setdefault(owner_id, {})
+    for key, value in delta.items():
+        owner_delta[key] = owner_delta.get(key, 0) + value
+
+
+async def flush_stats_deltas():
+    """Apply the deferred deltas in one bulk write."""
+    global _deferred_deltas
+    deltas, _deferred_deltas = _deferred_deltas, {}
+    await apply_stats_deltas(list(deltas.items()))
+
+
+def _format(doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    doc = doc or {}
+    bands = doc.get("price_bands") or {}
+    return {
+        "items": int(doc.get("items", 0)),
+        "units": int(doc.get("units", 0)),
+        "stock_value": round(doc.get("stock_value", 0.0), 2),
+        "out_of_stock": int(doc.get("out_of_stock", 0)),
+        "price_bands": {label: int(bands.get(label, 0)) for label in PRICE_BAND_LABELS},
+    }
+
+
+async def get_item_stats(owner_id: Optional[ObjectId] = None) -> Dict[str, Any]:
+    """Rollup for one owner, or for the whole catalog."""
+    _id = CATALOG_STATS_ID if owner_id is None else owner_id
+    return _format(await _collection().find_one({"_id": _id}))
+
+
+def _band_condition(index: int) -> Dict[str, Any]:
+    conditions = []
+    if index > 0:
+        conditions.append({"$gte": ["$price", PRICE_BANDS[index - 1]]})
+    if index < len(PRICE_BANDS):
+        conditions.append({"$lt": ["$price", PRICE_BANDS[index]]})
+    return {"$and": conditions}
+
+
+async def compute_item_stats() -> Dict[Any, Dict[str, Any]]:
+    """Rollups recomputed from the items: one `$group` scan of the collection."""
+    group: Dict[str, Any] = {
+        "_id": "$owner_id",
+        "items": {"$sum": 1},
+        "units": {"$sum": "$quantity"},
+        "stock_value": {"$sum": {"$multiply": ["$price", "$quantity"]}},
+        "out_of_stock": {"$sum": {"$cond": [{"$lte": ["$quantity", 0]}, 1, 0]}},
+    }
+    for index in range(len(PRICE_BAND_LABELS)):
+        group[f"band_{index}"] = {"$sum": {"$cond": [_band_condition(index), 1, 0]}}
+
+    rollups: Dict[Any, Dict[str, Any]] = {}
+    catalog: Dict[str, Any] = {key: 0 for key in COUNTERS}
+    catalog["price_bands"] = {label: 0 for label in PRICE_BAND_LABELS}
+    cursor = ItemModel.get_motor_collection().aggregate([{"$group": group}])
+    async for row in cursor:
+        rollup = {key: row[key] for key in COUNTERS}
+        rollup["price_bands"] = {
+            label: row[f"band_{index}"] for index, label in enumerate(PRICE_BAND_LABELS)
+        }
+        rollups[row["_id"]] = rollup
+        for key in COUNTERS:
+            catalog[key] += rollup[key]
+        for label, count in rollup["price_bands"].items():
+            catalog["price_bands"][label] += count
+    rollups[CATALOG_STATS_ID] = catalog
+    return rollups
+
+
+def _differs(stored: Dict[str, Any], computed: Dict[str, Any]) -> bool:
+    stored, computed = _format(stored), _format(computed)
+    value, expected = stored.pop("stock_value"), computed.pop("stock_value")
+    if abs(value - expected) > max(0.01, abs(expected) * STOCK_VALUE_TOLERANCE):
+        return True
+    return stored != computed
+
+
+async def verify_item_stats() -> List[str]:
+    """IDs of the rollups that disagree with a fresh computation."""
+    computed = await compute_item_stats()
+    stored = {doc["_id"]: doc async for doc in _collection().find({})}
+    mismatched = [
+        str(_id)
+        for _id in computed.keys() | stored.keys()
+        if _differs(stored.get(_id, {}), computed.get(_id, {}))
+    ]
+    return sorted(mismatched)
+
+
+async def rebuild_item_stats() -> int:
+    """Replace every rollup with a fresh computation; return how many were written.
+
+    The rollups are written to a separate collection which is then renamed
+    over the live one, so readers and `$inc` deltas see either the old set or
+    the new one, never a mix of both. Deltas applied to the old set while the
+    items are scanned are still lost; see the module docstring.
+    """
+    computed = await compute_item_stats()
+    staging = get_database()[ITEM_STATS_REBUILD_COLLECTION]
+    await staging.drop()
+    await staging.insert_many([{"_id": _id, **rollup} for _id, rollup in computed.items()])
+    await staging.rename(ITEM_STATS_COLLECTION, dropTarget=True)
+    return len(computed)
+
+
+async def ensure_item_stats():
+    """Build the rollups on first start; afterwards they are kept incrementally."""
+    if await _collection().find_one({"_id": CATALOG_STATS_ID}, {"_id": 1}) is None:
+        count = await rebuild_item_stats()
+        logger.info("Built item stats rollups for %d owner(s).", count - 1)
+
+
+async def _main(command: str) -> int:
+    from app.database import close_db, init_db
+
+    await init_db()
+    try:
+        if command == "rebuild":
+            print(f"Rebuilt {await rebuild_item_stats()} item stats rollup(s).")
+            return 0
+        mismatched = await verify_item_stats()
+        for _id in mismatched:
+            print(f"Item stats out of date: {_id}")
+        print("Item stats are consistent." if not mismatched else "Run `rebuild` to fix.")
+        return 1 if mismatched else 0
+    finally:
+        close_db()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("verify", "rebuild"):
+        sys.exit("usage: python -m app.stats verify|rebuild")
+    sys.exit(asyncio.run(_main(sys.argv[1])))
@@ -0,0 +1,257 @@
+import asyncio
+import codecs
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from beanie import PydanticObjectId
+from fastapi import HTTPException, Request
+from pydantic import BaseModel
+
+try:
+    import python_multipart as multipart
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:
+    import multipart
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import parse_options_header
+
+from app.crud import (
+    MAX_UPLOAD_FILE_BYTES,
+    MAX_UPLOAD_REQUEST_BYTES,
+    UPLOAD_CONCURRENCY,
+    delete_stored_files,
+    store_gridfs_file,
+)
+from app.schemas import FileResponse
+
+
+MAX_FORM_FIELD_BYTES = 64 * 1024
+# Chunks buffered per file between the request parser and its GridFS writer.
+UPLOAD_QUEUE_CHUNKS = 8
+
+
+class _FileWriter:
+    """One file part being written to GridFS by a background task."""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_CHUNKS)
+        self.task: Optional[asyncio.Task] = None
+        self.length = 0
+
+    async def chunks(self):
+        while (chunk := await self.queue.get()) is not None:
+            yield chunk
+
+    async def feed(self, item: Optional[bytes]):
+        """Hand a chunk (or the end marker) to the writer, surfacing its errors."""
+        if self.task.done():
+            self.task.result()
+        if not self.queue.full():
+            self.queue.put_nowait(item)
+            return
+        # Writer is behind: wait for room, unless it fails in the meantime.
+        put = asyncio.ensure_future(self.queue.put(item))
+        await asyncio.wait({put, self.task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            self.task.result()
+
+
+class GridFSFormParser:
+    """Parse a multipart/form-data body, streaming file parts into GridFS.
+
+    Unlike FastAPI's form handling, file parts are never spooled to a
+    temporary file: each one is handed chunk by chunk to its own writer task
+    while the parser keeps reading the body, with at most UPLOAD_CONCURRENCY
+    files being written at once. Size limits are enforced as bytes arrive.
+    If anything fails, every file written so far is removed.
+    """
+
+    def __init__(self, request: Request, owner_id: PydanticObjectId, files_field: str):
+        self.request = request
+        self.owner_id = owner_id
+        self.files_field = files_field
+        self.fields: Dict[str, str] = {}
+        self._charset = "utf-8"
+        self._slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+        self._writers: List[_FileWriter] = []
+        self._received = 0
+        # Parser callbacks are synchronous; they queue events that parse() awaits.
+        self._events: List[Tuple[str, Any]] = []
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._content_type = b""
+        self._part_kind: Optional[str] = None  # "field", "file" or "skip"
+        self._part_name = ""
+        self._field_data = bytearray()
+
+    # --- python-multipart callbacks ---
+    def on_part_begin(self):
+        self._disposition = b""
+        self._content_type = b""
+        self._field_data = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        name = self._header_name.lower()
+        if name == b"content-disposition":
+            self._disposition = self._header_value
+        elif name == b"content-type":
+            self._content_type = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise HTTPException(
+                status_code=400,
+                detail='The Content-Disposition header field "name" must be provided.',
+            )
+        self._part_name = options[b"name"].decode(self._charset)
+        if b"filename" not in options:
+            self._part_kind = "field"
+            return
+        filename = options[b"filename"].decode(self._charset)
+        # Browsers send an empty file part when no file was picked.
+        if self._part_name != self.files_field or not filename:
+            self._part_kind = "skip"
+            return
+        self._part_kind = "file"
+        content_type = self._content_type.decode("latin-1") or None
+        self._events.append(("begin", (filename, content_type)))
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._part_kind == "field":
+            self._field_data += data[start:end]
+            if len(self._field_data) > MAX_FORM_FIELD_BYTES:
+                raise HTTPException(
+                    status_code=413, detail=f"Form field '{self._part_name}' is too large."
+                )
+        elif self._part_kind == "file":
+            self._events.append(("data", data[start:end]))
+
+    def on_part_end(self):
+        if self._part_kind == "field":
+            self.fields[self._part_name] = self._field_data.decode(self._charset)
+        elif self._part_kind == "file":
+            self._events.append(("end", None))
+
+    # --- streaming ---
+    async def _start_writer(self, filename: str, content_type: Optional[str]):
+        await self._slots.acquire()
+        writer = _FileWriter()
+
+        async def run():
+            try:
+                return await store_gridfs_file(
+                    filename, content_type, self.owner_id, writer.chunks()
+                )
+            finally:
+                self._slots.release()
+
+        writer.task = asyncio.create_task(run())
+        self._writers.append(writer)
+
+    async def _dispatch(self):
+        events, self._events = self._events, []
+        for kind, payload in events:
+            if kind == "begin":
+                await self._start_writer(*payload)
+            elif kind == "data":
+                writer = self._writers[-1]
+                writer.length += len(payload)
+                if writer.length > MAX_UPLOAD_FILE_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the {MAX_UPLOAD_FILE_BYTES} byte limit.",
+                    )
+                await writer.feed(payload)
+            else:
+                await self._writers[-1].feed(None)
+
+    async def _rollback(self):
+        for writer in self._writers:
+            writer.task.cancel()
+        results = await asyncio.gather(
+            *(writer.task for writer in self._writers), return_exceptions=True
+        )
+        await delete_stored_files(
+            [r for r in results if isinstance(r, FileResponse)], self.owner_id
+        )
+
+    async def parse(self) -> Tuple[Dict[str, str], List[FileResponse]]:
+        """Consume the request body; return its fields and the stored files."""
+        _, params = parse_options_header(self.request.headers["content-type"])
+        charset = params.get(b"charset", b"utf-8").decode("latin-1")
+        try:
+            self._charset = codecs.lookup(charset).name
+        except LookupError:
+            self._charset = "latin-1"
+        if b"boundary" not in params:
+            raise HTTPException(status_code=400, detail="Missing boundary in multipart.")
+
+        parser = multipart.MultipartParser(
+            params[b"boundary"],
+            {
+                "on_part_begin": self.on_part_begin,
+                "on_part_data": self.on_part_data,
+                "on_part_end": self.on_part_end,
+                "on_header_field": self.on_header_field,
+                "on_header_value": self.on_header_value,
+                "on_header_end": self.on_header_end,
+                "on_headers_finished": self.on_headers_finished,
+            },
+        )
+        try:
+            async for chunk in self.request.stream():
+                self._received += len(chunk)
+                if self._received > MAX_UPLOAD_REQUEST_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Request exceeds the {MAX_UPLOAD_REQUEST_BYTES} byte limit.",
+                    )
+                parser.write(chunk)
+                await self._dispatch()
+            parser.finalize()
+            await self._dispatch()
+            stored = await asyncio.gather(*(writer.task for writer in self._writers))
+        except BaseException as exc:
+            await self._rollback()
+            if isinstance(exc, FormParserError):
+                raise HTTPException(status_code=400, detail="Invalid multipart data.")
+            raise
+        return self.fields, list(stored)
+
+
+async def parse_upload_form(
+    request: Request, owner_id: PydanticObjectId, files_field: str = "files"
+) -> Tuple[Dict[str, str], List[FileResponse]]:
+    """Read a form submission, storing the files of `files_field` in GridFS."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        return await GridFSFormParser(request, owner_id, files_field).parse()
+    # URL-encoded forms cannot carry files.
+    form = await request.form()
+    return {key: value for key, value in form.items() if isinstance(value, str)}, []
+
+
+def multipart_openapi(model: Type[BaseModel], files_field: str = "files") -> dict:
+    """OpenAPI `requestBody` for a form made of `model`'s fields plus files."""
+    schema = model.model_json_schema()
+    schema["properties"][files_field] = {
+        "type": "array",
+        "items": {"type": "string", "format": "binary"},
+    }
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"multipart/form-data": {"schema": schema}},
+        }
+    }
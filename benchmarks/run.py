@@ -0,0 +1,481 @@
+"""Load test and micro-benchmarks for the MongoMart API.
+
+Boots the FastAPI app in process against a throwaway MongoDB database, seeds
+users, items and GridFS images, then drives each endpoint at a fixed
+concurrency and reports throughput, latency percentiles and MongoDB round
+trips per request as JSON. With --baseline, results are compared against an
+earlier run and the exit status is 1 if any scenario regressed.
+
+    python -m benchmarks.run                       # spawns a temporary mongod
+    python -m benchmarks.run --mongo-url mongodb://localhost:27017
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.1
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+
+BENCH_DB_NAME = "mongomart_bench"
+BENCH_PASSWORD = "bench-password"
+DEFAULT_SCENARIOS = (
+    "login",
+    "list",
+    "user-list",
+    "get",
+    "create",
+    "update",
+    "upload",
+    "download",
+)
+
+
+class RoundTripCounter(monitoring.CommandListener):
+    """Counts MongoDB commands sent by every client created after registration."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+round_trips = RoundTripCounter()
+
+
+# --- MongoDB ---
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_mongod() -> Tuple[subprocess.Popen, str, str]:
+    """Start a mongod on a free port with a temporary data directory."""
+    mongod = shutil.which("mongod")
+    if not mongod:
+        sys.exit("mongod not found on PATH; pass --mongo-url to use a running server.")
+    dbpath = tempfile.mkdtemp(prefix="mongomart-bench-")
+    port = _free_port()
+    proc = subprocess.Popen(
+        [mongod, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, dbpath, f"mongodb://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    sys.exit("mongod did not start within 30 seconds.")
+
+
+# --- Seeding ---
+def make_image(rng: random.Random, width: int = 800, height: int = 600) -> bytes:
+    """A noisy JPEG, so compression and resizing do realistic work."""
+    from PIL import Image
+
+    image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=85)
+    return out.getvalue()
+
+
+async def seed(client, args, rng: random.Random) -> Dict[str, Any]:
+    """Create users, items and images through the API; return what was made."""
+    users: List[Dict[str, Any]] = []
+    for n in range(args.users):
+        email = f"bench{n}@example.com"
+        await client.post("/signup", json={"email": email, "password": BENCH_PASSWORD})
+        resp = await client.post("/login", json={"email": email, "password": BENCH_PASSWORD})
+        resp.raise_for_status()
+        token = resp.json()["access_token"]
+        users.append({"email": email, "headers": {"Authorization": f"Bearer {token}"}})
+
+    item_ids: Dict[str, List[str]] = {user["email"]: [] for user in users}
+    per_user = max(1, args.items // len(users))
+    for user in users:
+        rows = [
+            {
+                "name": f"Item {rng.randrange(10**6)}",
+                "description": " ".join(
+                    rng.choice(("red", "blue", "large", "small", "vintage", "new", "classic"))
+                    for _ in range(12)
+                ),
+                "price": round(rng.uniform(1, 500), 2),
+                "quantity": rng.randrange(0, 100),
+            }
+            for _ in range(per_user)
+        ]
+        resp = await client.post("/items/bulk", json=rows, headers=user["headers"])
+        resp.raise_for_status()
+        item_ids[user["email"]] = [r["id"] for r in resp.json()["results"] if r["id"]]
+
+    images = [make_image(rng) for _ in range(min(args.images, 8))]
+    file_ids: List[str] = []
+    for n in range(args.images):
+        user = users[n % len(users)]
+        # Distinct bytes per upload so content deduplication does not kick in.
+        data = images[n % len(images)] + n.to_bytes(4, "big")
+        resp = await client.post(
+            "/uploadfile",
+            files={"file": (f"bench{n}.jpg", data, "image/jpeg")},
+            headers=user["headers"],
+        )
+        resp.raise_for_status()
+        file_id = resp.json()["file_id"]
+        file_ids.append(file_id)
+        owned = item_ids[user["email"]]
+        if owned:
+            await client.post(
+                f"/items/{rng.choice(owned)}/associate-image/{file_id}",
+                headers=user["headers"],
+            )
+    return {"users": users, "item_ids": item_ids, "file_ids": file_ids, "images": images}
+
+
+# --- Scenarios ---
+def build_scenarios(data: Dict[str, Any]) -> Dict[str, Callable[[Any, random.Random], Awaitable[Any]]]:
+    users = data["users"]
+
+    def owned_item(rng):
+        user = rng.choice(users)
+        return user, rng.choice(data["item_ids"][user["email"]])
+
+    async def login(client, rng):
+        user = rng.choice(users)
+        return await client.post(
+            "/login", json={"email": user["email"], "password": BENCH_PASSWORD}
+        )
+
+    async def list_items(client, rng):
+        return await client.get("/items", params={"limit": 20})
+
+    async def list_user_items(client, rng):
+        # Not response cached: a full page of every field measures serialization.
+        user = rng.choice(users)
+        return await client.get(
+            "/user/items",
+            params={"limit": 100, "fields": "name,description,price,quantity,image_ids"},
+            headers=user["headers"],
+        )
+
+    async def get_item(client, rng):
+        # Items are only readable by their owner.
+        user, item_id = owned_item(rng)
+        return await client.get(f"/items/{item_id}", headers=user["headers"])
+
+    async def create(client, rng):
+        user = rng.choice(users)
+        return await client.post(
+            "/items",
+            data={"name": "Bench item", "price": "9.99", "quantity": "3"},
+            headers=user["headers"],
+        )
+
+    async def update(client, rng):
+        user, item_id = owned_item(rng)
+        return await client.put(
+            f"/items/{item_id}",
+            json={"price": round(rng.uniform(1, 500), 2)},
+            headers=user["headers"],
+        )
+
+    async def upload(client, rng):
+        user = rng.choice(users)
+        data_bytes = rng.choice(data["images"]) + rng.getrandbits(64).to_bytes(8, "big")
+        return await client.post(
+            "/uploadfile",
+            files={"file": ("bench.jpg", data_bytes, "image/jpeg")},
+            headers=user["headers"],
+        )
+
+    async def download(client, rng):
+        return await client.get(f"/file/{rng.choice(data['file_ids'])}")
+
+    return {
+        "login": login,
+        "list": list_items,
+        "user-list": list_user_items,
+        "get": get_item,
+        "create": create,
+        "update": update,
+        "upload": upload,
+        "download": download,
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(client, request, args, seed_value: int) -> Dict[str, Any]:
+    """Send `args.requests` requests from `args.concurrency` workers."""
+    rng = random.Random(seed_value)
+    for _ in range(args.warmup):
+        await request(client, rng)
+
+    latencies: List[float] = []
+    errors = 0
+    rate_limited = 0
+    remaining = args.requests
+
+    async def worker(worker_rng):
+        nonlocal remaining, errors, rate_limited
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            resp = await request(client, worker_rng)
+            latencies.append(time.perf_counter() - started)
+            # A 429 only measures the admission limits, not the endpoint.
+            if resp.status_code == 429:
+                rate_limited += 1
+            # A redirect or 304 is not what the scenario meant to measure either.
+            elif not 200 <= resp.status_code < 300:
+                errors += 1
+
+    commands_before = round_trips.count
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(worker(random.Random(rng.getrandbits(32))) for _ in range(args.concurrency))
+    )
+    elapsed = time.perf_counter() - started
+    commands = round_trips.count - commands_before
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rate_limited": rate_limited,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": ms(statistics.fmean(latencies)) if latencies else 0.0,
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1]) if latencies else 0.0,
+        },
+        "db_round_trips_per_request": round(commands / len(latencies), 2) if latencies else None,
+    }
+
+
+# --- Baseline comparison ---
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Describe every scenario that failed or was rate limited more often than
+    `baseline`, or got slower than it by more than `threshold`."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(
+                f"{name}: {current['errors']} non-2xx responses "
+                f"> baseline {previous.get('errors', 0)}"
+            )
+        share, previous_share = (
+            current.get("rate_limited", 0) / max(current["requests"], 1),
+            previous.get("rate_limited", 0) / max(previous["requests"], 1),
+        )
+        if share > previous_share:
+            regressions.append(
+                f"{name}: {share:.1%} of requests rate limited (429) "
+                f"> baseline {previous_share:.1%}"
+            )
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']} rps "
+                f"< baseline {previous['throughput_rps']} rps"
+            )
+        if current["latency_ms"]["p95"] > previous["latency_ms"]["p95"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {current['latency_ms']['p95']} ms "
+                f"> baseline {previous['latency_ms']['p95']} ms"
+            )
+        trips, previous_trips = (
+            current["db_round_trips_per_request"],
+            previous.get("db_round_trips_per_request"),
+        )
+        if trips is not None and previous_trips is not None and trips > previous_trips + 0.01:
+            regressions.append(
+                f"{name}: {trips} DB round trips per request > baseline {previous_trips}"
+            )
+    return regressions
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Entry point ---
+async def drop_bench_database(database):
+    # A client of its own: the app's is only connected inside the lifespan.
+    client = database.create_client()
+    try:
+        await client.drop_database(BENCH_DB_NAME)
+    finally:
+        client.close()
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+
+    from app import database
+    from app.main import app
+
+    await drop_bench_database(database)
+    rng = random.Random(args.seed)
+    results: Dict[str, Any] = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            key: getattr(args, key)
+            for key in ("users", "items", "images", "requests", "concurrency", "warmup", "seed")
+        },
+        "scenarios": {},
+    }
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench", timeout=60
+            ) as client:
+                seed_started = time.perf_counter()
+                data = await seed(client, args, rng)
+                results["seed_seconds"] = round(time.perf_counter() - seed_started, 3)
+                scenarios = build_scenarios(data)
+                for name in args.scenarios:
+                    results["scenarios"][name] = await run_scenario(
+                        client, scenarios[name], args, rng.getrandbits(32)
+                    )
+                    print(
+                        f"{name:>10}: {results['scenarios'][name]['throughput_rps']} rps, "
+                        f"p95 {results['scenarios'][name]['latency_ms']['p95']} ms",
+                        file=sys.stderr,
+                    )
+    finally:
+        if not args.keep_data:
+            await drop_bench_database(database)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", help="Use this server instead of spawning mongod.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500, help="Per scenario.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per scenario.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--scenarios",
+        type=lambda value: value.split(","),
+        default=list(DEFAULT_SCENARIOS),
+        help=f"Comma separated subset of: {','.join(DEFAULT_SCENARIOS)}.",
+    )
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout.")
+    parser.add_argument("--baseline", help="Compare against results saved earlier.")
+    parser.add_argument("--save-baseline", help="Also write the results here.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Allowed relative slowdown before a scenario counts as a regression.",
+    )
+    parser.add_argument("--keep-data", action="store_true", help="Do not drop the bench database.")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(DEFAULT_SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    mongod = None
+    mongo_url = args.mongo_url
+    if not mongo_url:
+        mongod, dbpath, mongo_url = spawn_mongod()
+
+    # Settings are read at import time, so they must be in place before app is imported.
+    os.environ["MONGO_URL"] = mongo_url
+    os.environ["MONGO_DB_NAME"] = BENCH_DB_NAME
+    os.environ.setdefault("ORPHAN_SWEEP_ENABLED", "false")
+    os.environ.setdefault("QUERY_PLAN_CHECK", "off")
+    # Per-user rate limits would turn the write scenarios into a test of the
+    # token buckets: a handful of bench users send hundreds of requests each.
+    for endpoint_class in ("upload", "write", "read"):
+        os.environ.setdefault(f"RATE_LIMIT_{endpoint_class.upper()}_PER_SECOND", "0")
+    monitoring.register(round_trips)
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if mongod:
+            mongod.terminate()
+            mongod.wait()
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        results["baseline"] = args.baseline
+        results["regressions"] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(output + "\n")
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
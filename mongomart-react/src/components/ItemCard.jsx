@@ -9,7 +9,7 @@ const ItemCard = ({ item, isOwnerItem, onDelete }) => {
 
   const firstImageId = item.image_ids && item.image_ids.length > 0 ? item.image_ids[0] : null;
   const imageUrl = firstImageId
-    ? getFileUrl(firstImageId)
+    ? getFileUrl(firstImageId, 'card')
     : 'https://placehold.co/600x400/e2e8f0/cbd5e0?text=No+Image';
 
   const handleDelete = async (e) => {
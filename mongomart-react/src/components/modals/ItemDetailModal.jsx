@@ -66,7 +66,7 @@ const ItemDetailModal = ({ onItemDeleted }) => {
               item.image_ids.map(id => (
                 <img
                   key={id}
-                  src={getFileUrl(id)}
+                  src={getFileUrl(id, 'detail')}
                   alt={`${item.name} image`}
                   className="w-full h-auto rounded-md mb-2 max-h-60 object-contain"
                   onError={(e) => { e.target.onerror = null; e.target.src = 'https://placehold.co/600x400/e2e8f0/cbd5e0?text=Image+Error'; }}
@@ -1,35 +1,77 @@
 import React, { useState, useEffect } from 'react';
-import { getAllItems } from '../services/api';
+import { getAllItems, searchItems } from '../services/api';
 import ItemCard from '../components/ItemCard';
 import Loader from '../components/Loader';
 import { useNotification } from '../contexts/NotificationContext';
 
 const AllItemsPage = () => {
   const [items, setItems] = useState([]);
+  const [nextToken, setNextToken] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [query, setQuery] = useState('');
+  const [activeQuery, setActiveQuery] = useState('');
   const { showNotification } = useNotification();
 
+  const fetchPage = (next = null) => (
+    activeQuery ? searchItems(activeQuery, next) : getAllItems(next)
+  );
+
   const fetchItems = async () => {
     setLoading(true);
     try {
-      const data = await getAllItems();
-      setItems(data);
+      const data = await fetchPage();
+      setItems(data.items);
+      setNextToken(data.next);
     } catch (error) {
       showNotification(error.message || 'Failed to load items.', 'error');
       setItems([]); // Ensure items is an array on error
+      setNextToken(null);
     } finally {
       setLoading(false);
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const data = await fetchPage(nextToken);
+      setItems(prevItems => [...prevItems, ...data.items]);
+      setNextToken(data.next);
+    } catch (error) {
+      showNotification(error.message || 'Failed to load more items.', 'error');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchItems();
-  }, []); 
+  }, [activeQuery]);
+
+  const handleSearch = (e) => {
+    e.preventDefault();
+    setActiveQuery(query.trim());
+  };
+
+  const searchForm = (
+    <form onSubmit={handleSearch} className="mb-6 flex gap-2">
+      <input
+        type="search"
+        value={query}
+        onChange={(e) => setQuery(e.target.value)}
+        placeholder="Search items..."
+        className="form-input flex-grow"
+      />
+      <button type="submit" className="btn-primary px-4 py-2 rounded-md">Search</button>
+    </form>
+  );
 
   if (loading) {
     return (
       <>
         <h1 className="text-3xl font-semibold text-gray-800 mb-6">All Items</h1>
+        {searchForm}
         <Loader />
       </>
     );
@@ -38,6 +80,7 @@ const AllItemsPage = () => {
   return (
     <div>
       <h1 className="text-3xl font-semibold text-gray-800 mb-6">All Items</h1>
+      {searchForm}
       {items && items.length > 0 ? (
         <div className="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 gap-6">
           {items.map(item => (
@@ -47,6 +90,13 @@ const AllItemsPage = () => {
       ) : (
         <p className="text-gray-600 text-center py-8">No items found.</p>
       )}
+      {nextToken && (
+        <div className="text-center mt-6">
+          <button type="button" onClick={loadMore} disabled={loadingMore} className="btn-secondary px-6 py-2 rounded-md">
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -9,7 +9,9 @@ import { useModals } from '../contexts/ModalContext';
 
 const MyItemsPage = ({ onNavigate }) => {
   const [items, setItems] = useState([]);
+  const [nextToken, setNextToken] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const { showNotification } = useNotification();
   const { isAuthenticated } = useAuth();
   const { openModal } = useModals();
@@ -26,15 +28,30 @@ const MyItemsPage = ({ onNavigate }) => {
     setLoading(true);
     try {
       const data = await getUserItems();
-      setItems(data);
+      setItems(data.items);
+      setNextToken(data.next);
     } catch (error) {
       showNotification(error.message || 'Failed to load your items.', 'error');
       setItems([]);
+      setNextToken(null);
     } finally {
       setLoading(false);
     }
   }, [isAuthenticated, showNotification, openModal, onNavigate]);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const data = await getUserItems(nextToken);
+      setItems(prevItems => [...prevItems, ...data.items]);
+      setNextToken(data.next);
+    } catch (error) {
+      showNotification(error.message || 'Failed to load more items.', 'error');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchUserItems();
   }, [fetchUserItems]);
@@ -67,6 +84,13 @@ const MyItemsPage = ({ onNavigate }) => {
       ) : (
         <p className="text-gray-600 text-center py-8">You haven't added any items yet.</p>
       )}
+      {nextToken && (
+        <div className="text-center mt-6">
+          <button type="button" onClick={loadMore} disabled={loadingMore} className="btn-secondary px-6 py-2 rounded-md">
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -44,13 +44,28 @@ export const signupUser = async (email, password) => {
   return response.data;
 };
 
-export const getAllItems = async () => {
-  const response = await apiClient.get('/items/');
+// Fields shown by ItemCard; the list endpoints only return what is asked for.
+const ITEM_CARD_FIELDS = 'name,description,price,quantity,image_ids';
+
+// List endpoints are paginated: they return { items: [...], next: "<token>" | null }.
+export const getAllItems = async (next = null) => {
+  const response = await apiClient.get('/items', {
+    params: { fields: ITEM_CARD_FIELDS, ...(next ? { next } : {}) },
+  });
   return response.data;
 };
 
-export const getUserItems = async () => {
-  const response = await apiClient.get('/user/items');
+export const searchItems = async (q, next = null) => {
+  const response = await apiClient.get('/items/search', {
+    params: { q, fields: ITEM_CARD_FIELDS, ...(next ? { next } : {}) },
+  });
+  return response.data;
+};
+
+export const getUserItems = async (next = null) => {
+  const response = await apiClient.get('/user/items', {
+    params: { fields: ITEM_CARD_FIELDS, ...(next ? { next } : {}) },
+  });
   return response.data;
 };
 
@@ -74,9 +89,10 @@ export const deleteItem = async (itemId) => {
   return response.data; // Or handle 204 No Content
 };
 
-// Function to get image URL
-export const getFileUrl = (fileId) => {
-  return `${API_BASE_URL}/file/${fileId}`;
+// Function to get image URL. `variant` picks a resized copy: 'thumb', 'card' or 'detail'.
+export const getFileUrl = (fileId, variant = null) => {
+  const url = `${API_BASE_URL}/file/${fileId}`;
+  return variant ? `${url}?variant=${variant}` : url;
 };
 
 export default apiClient;
\ No newline at end of file